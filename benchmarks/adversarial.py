@@ -0,0 +1,97 @@
+"""Benchmark critical and flavor extraction over adversarial effects.
+
+Usage: python -m benchmarks.adversarial --max-chars 16000
+"""
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from skill_cards_generator.skill_crawler import (
+    critical_regex, find_critical, find_flavor, flavor_regex)
+
+
+# Effects making the regexes backtrack over the rest of the text at each
+# keyword, generated to about the given number of characters
+cases: Dict[str, Callable[[int], str]] = {
+    'critical keywords without terminator': lambda size: 'cr:x' * (size // 4),
+    'critical keywords before spaces': lambda size: ('crit:' + ' ' * 20) * (size // 25),
+    'flavor keywords before a line break': lambda size: '## 。' * (size // 4) + '\nx',
+    'flavor text before a line break': lambda size: '##' + 'x 。' * (size // 3) + '\nx',
+}
+
+
+def regex_critical(text: str) -> Optional[Tuple[int, int, str]]:
+    match = critical_regex.search(text)
+    if match is None:
+        return None
+    return match.start(), match.end(), match.group('text')
+
+
+def regex_flavor(text: str) -> Optional[Tuple[int, str]]:
+    match = flavor_regex.search(text)
+    if match is None:
+        return None
+    return match.start(), match.group('text')
+
+
+def per_char(function: Callable[[str], Any], text: str, repeat: int) -> float:
+    """Return the best time of function over text in nanoseconds per character."""
+    best = float('inf')
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        function(text)
+        best = min(best, time.perf_counter() - begin)
+    return best * 1e9 / max(len(text), 1)
+
+
+def run(max_chars: int, repeat: int, regex_max_chars: int) -> List[Dict[str, Any]]:
+    results = []
+    for case, generate in cases.items():
+        size = 1000
+        while size <= max_chars:
+            text = generate(size)
+            result: Dict[str, Any] = {
+                'case': case,
+                'chars': len(text),
+                'scan_ns_per_char': per_char(
+                    lambda t: (find_critical(t), find_flavor(t)), text, repeat),
+                'regex_ns_per_char': None,
+            }
+            if len(text) <= regex_max_chars:
+                if find_critical(text) != regex_critical(text) \
+                        or find_flavor(text) != regex_flavor(text):
+                    raise AssertionError(f'scan differs from regexes: {case}')
+                result['regex_ns_per_char'] = per_char(
+                    lambda t: (regex_critical(t), regex_flavor(t)), text, repeat)
+            results.append(result)
+            size *= 2
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-chars', type=int, default=64000,
+                        help='Largest effect to measure.')
+    parser.add_argument('--regex-max-chars', type=int, default=8000,
+                        help='Largest effect to measure the regexes over, '
+                             'which take quadratic time.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs; the best one is reported.')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as json.')
+    params = parser.parse_args()
+
+    results = run(params.max_chars, params.repeat, params.regex_max_chars)
+    if params.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f'{"case":<40}{"chars":>8}{"scan ns/c":>12}{"regex ns/c":>12}')
+    for result in results:
+        regex = result['regex_ns_per_char']
+        regex_text = '-' if regex is None else f'{regex:.0f}'
+        print(f'{result["case"]:<40}{result["chars"]:>8}'
+              f'{result["scan_ns_per_char"]:>12.0f}{regex_text:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import random
+from typing import List, Optional
+from skill_cards_generator.skill_crawler import (
+    unify_timing_table, unify_critical_table)
+from skill_cards_generator.judge import unify_judge_table
+from skill_cards_generator.target import unify_target_table
+from skill_cards_generator.skill_range import SkillRange
+from skill_cards_generator.classifier import unify_classifier_table
+from skill_cards_generator.element import Element
+from skill_cards_generator.ability import Ability
+from skill_cards_generator.zenhan import han_to_zen
+
+
+skill_names = ['ワイドアタック', 'ゲイルスラッシュ', 'コンストレイン', 'コキュートス',
+               'フロストプリズム', 'タイムマジック', 'ｶﾞｰﾃﾞｨｱﾝ', 'Ｍｉｇｈｔ']
+ruby_names = ['|疾風剣(しっぷうけん)', '｜氷槍《ひょうそう》', '蒼き|雷(いかずち)']
+sentences = ['対象に魔法攻撃を行なう。', '武器攻撃を行う。', 'そのメインプロセスの間、命中判定に+1D。',
+             '対象が行なう回避判定に-2Dする。', 'ダメージに+(SL*5)する。', '拒否可能。',
+             'シーン終了まで持続。', 'ラウンド終了まで持続。', 'DR直前に使用する。',
+             'その攻撃のダメージは[2D+20]となる。', 'HPを[SLd+10]点回復する。']
+ranges = ['20m', '5sq', '至近', '30', '10M']
+costs = ['-', 'なし', '4', '１２', 'fate1', 'フェイト2点', 'f3']
+limitations = ['-', 'SL/Sn', '1/sr', '3/mp', 'シーン1回', 'シナリオ3回', '3', '']
+slash_escaped_words = {'sn', 'sr', 'Sn', 'Sr', 'SN', 'SR', 'mp', 'MP', 'Mp'}
+header_lines = ['キャラクター名：テスト', '■能力値■', '筋力 12', '■スキル■']
+footer_lines = ['■コネクション■', 'テストとの関係：友人']
+
+
+def _alias(rng: random.Random, table) -> str:
+    # Aliases with spaces can not be written in a field of a skill line
+    key, candidates = rng.choice(list(table))
+    return rng.choice(sorted(
+        candidate for candidate in candidates
+        if not any(char.isspace() for char in candidate)))
+
+
+def _maybe(rng: random.Random, rate: float, text: str) -> str:
+    return text if rng.random() < rate else ''
+
+
+def generate_effect(rng: random.Random, num_sentences: int) -> str:
+    parts: List[str] = []
+    if rng.random() < 0.3:
+        classifier = _alias(rng, unify_classifier_table)
+        if rng.random() < 0.5:
+            classifier = 'Mg' + ''.join(
+                str(elem) for elem in rng.sample(list(Element), rng.randint(1, 2)))
+        parts.append(classifier + '。')
+    for _ in range(num_sentences):
+        sentence = rng.choice(sentences)
+        if rng.random() < 0.4:
+            sentence = f'この《{rng.choice(skill_names)}》で' + sentence
+        parts.append(sentence)
+    parts.append(_maybe(
+        rng, 0.3, rng.choice(['クリティカル:', 'cr>', 'crit:', 'クリ→'])
+        + _alias(rng, unify_critical_table) + '。'))
+    parts.append(_maybe(
+        rng, 0.5, rng.choice(['フレーバー: ', 'flav:', '##', 'fl>'])
+        + '素早い動きで攻撃するスキル。'))
+    return ''.join(parts)
+
+
+def generate_skill_line(rng: random.Random, num_sentences: int = 3) -> str:
+    name = rng.choice(skill_names + ruby_names)
+    judge = _alias(rng, unify_judge_table)
+    if rng.random() < 0.2:
+        judge = str(rng.choice(list(Ability))) + rng.choice(['', '判定'])
+    if rng.random() < 0.1:
+        judge += f'({rng.randint(8, 20)})'
+    fields = [
+        _alias(rng, unify_timing_table),
+        judge,
+        _alias(rng, unify_target_table) if rng.random() < 0.8
+        else rng.choice(['3', '三体', 'SL']),
+        _alias(rng, SkillRange.kind_table) if rng.random() < 0.7
+        else rng.choice(ranges),
+        rng.choice(costs),
+        rng.choice(limitations),
+        generate_effect(rng, num_sentences),
+    ]
+    level = rng.choice(['1', '3', '5', 'SL', '８'])
+    for field_id in range(len(fields) - 2):
+        before = fields[field_id - 1] if field_id > 0 else level
+        if (fields[field_id][:2] in slash_escaped_words
+                and (before[-1:].isdigit() or before[-2:] in ('sl', 'SL'))):
+            # It would be taken as a usage limitation like 'SL/Sn'
+            fields[field_id] = han_to_zen(fields[field_id])
+    separator = rng.choice(['/', ' / '])
+    return f'《{name}》{level}{separator}' + separator.join(fields)
+
+
+def generate_sheet(
+    num_skills: int,
+    seed: Optional[int] = 0,
+    num_sentences: int = 3,
+    noise_rate: float = 0.1
+) -> str:
+    """Generate a synthetic charasheet text with num_skills skill lines."""
+    rng = random.Random(seed)
+    lines = list(header_lines)
+    lines.append('《スキル名》SL/タイミング/判定/対象/射程/コスト/使用条件/効果')
+    for _ in range(num_skills):
+        if rng.random() < noise_rate:
+            lines.append(rng.choice(['', '■一般スキル■', 'メモ：次回取得予定']))
+        lines.append(generate_skill_line(rng, num_sentences))
+    lines += footer_lines
+    return '\n'.join(lines) + '\n'
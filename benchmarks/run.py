@@ -0,0 +1,118 @@
+"""Benchmark each stage of the pipeline over a synthetic charasheet.
+
+Usage: python -m benchmarks.run --skills 5000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+from skill_cards_generator.skill_crawler import (
+    make_skills_from_charasheet, preprocess_line, skill_regex, split_skill_fields,
+    unify_effect)
+from skill_cards_generator.judge import Judge
+from skill_cards_generator.target import Target
+from skill_cards_generator.skill_range import SkillRange
+from skill_cards_generator.cost import Cost
+from skill_cards_generator.classifier import Classifier
+from skill_cards_generator.ruby_string import RubyString
+from skill_cards_generator.html_generator import generate_html
+from .corpus import generate_sheet
+
+
+Stage = Tuple[str, int, Callable[[], Any]]
+
+
+def measure(function: Callable[[], Any], repeat: int) -> Tuple[float, int]:
+    """Return the best wall time and the peak traced memory of function."""
+    best = float('inf')
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - begin)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def _each(constructor: Callable[[str], Any], texts: Sequence[str]) -> Callable[[], Any]:
+    return lambda: [constructor(text) for text in texts]
+
+
+def make_stages(sheet: str, sl_as_limit: bool) -> List[Stage]:
+    skills = make_skills_from_charasheet(sheet, sl_as_limit)
+    lines = [preprocess_line(line) for line in sheet.split('\n')]
+    matches = [fields for fields in map(split_skill_fields, lines)
+               if fields is not None]
+    names = [fields[0] for fields in matches]
+    judges = [fields[3] for fields in matches]
+    targets = [fields[4] for fields in matches]
+    ranges = [fields[5] for fields in matches]
+    costs = [fields[6] for fields in matches]
+    effects = [fields[8] for fields in matches]
+    classifiers = [effect.split('。', 1)[0] for effect in effects]
+    return [
+        ('make_skills_from_charasheet', len(skills),
+         lambda: make_skills_from_charasheet(sheet, sl_as_limit)),
+        ('skill_regex', len(lines), _each(skill_regex.fullmatch, lines)),
+        ('split_skill_fields', len(lines), _each(split_skill_fields, lines)),
+        ('unify_effect', len(effects), _each(unify_effect, effects)),
+        ('RubyString.from_text', len(names), _each(RubyString.from_text, names)),
+        ('Judge.from_text', len(judges), _each(Judge.from_text, judges)),
+        ('Target.from_text', len(targets), _each(Target.from_text, targets)),
+        ('SkillRange.from_text', len(ranges), _each(SkillRange.from_text, ranges)),
+        ('Cost.from_text', len(costs), _each(Cost.from_text, costs)),
+        ('Classifier.from_text', len(classifiers),
+         _each(Classifier.from_text, classifiers)),
+        ('generate_html', len(skills),
+         lambda: generate_html(skills, False, False)),
+        ('generate_html (template)', len(skills),
+         lambda: generate_html(skills, False, False, True)),
+    ]
+
+
+def run(num_skills: int, repeat: int, seed: int, sl_as_limit: bool) -> List[Dict[str, Any]]:
+    sheet = generate_sheet(num_skills, seed)
+    results = []
+    for name, count, function in make_stages(sheet, sl_as_limit):
+        seconds, peak = measure(function, repeat)
+        results.append({
+            'stage': name,
+            'items': count,
+            'seconds': seconds,
+            'items_per_second': count / seconds if seconds > 0 else None,
+            'peak_bytes': peak,
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--skills', type=int, default=2000,
+                        help='Number of skill lines in the synthetic sheet.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs; the best one is reported.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the synthetic sheet.')
+    parser.add_argument('--sl-as-limitation', action='store_true',
+                        help='Treat sl as sl limitation.')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as json.')
+    params = parser.parse_args()
+
+    results = run(params.skills, params.repeat, params.seed,
+                  params.sl_as_limitation)
+    if params.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f'{"stage":<30}{"items":>8}{"seconds":>10}{"items/s":>12}{"peak KiB":>10}')
+    for result in results:
+        print(f'{result["stage"]:<30}{result["items"]:>8}'
+              f'{result["seconds"]:>10.4f}{result["items_per_second"]:>12.0f}'
+              f'{result["peak_bytes"] / 1024:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark scaling of --jobs over a synthetic charasheet.
+
+Usage: python -m benchmarks.scaling --skills 20000 --max-jobs 8
+"""
+import argparse
+import io
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List
+from skill_cards_generator.skill_crawler import iter_skills
+from skill_cards_generator.html_generator import write_html
+from skill_cards_generator.parallel import write_html_parallel
+from .corpus import generate_sheet
+
+
+def best_time(function: Callable[[], str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - begin)
+    return best
+
+
+def run(
+    num_skills: int,
+    max_jobs: int,
+    repeat: int,
+    seed: int,
+    use_template: bool
+) -> List[Dict[str, Any]]:
+    sheet = generate_sheet(num_skills, seed)
+
+    def serial() -> str:
+        output = io.StringIO()
+        write_html(iter_skills(io.StringIO(sheet), False), output,
+                   False, False, use_template)
+        return output.getvalue()
+
+    def parallel(jobs: int) -> Callable[[], str]:
+        def function() -> str:
+            output = io.StringIO()
+            write_html_parallel(sheet, output, False, False, False,
+                                use_template, jobs)
+            return output.getvalue()
+        return function
+
+    expected = serial()
+    serial_seconds = best_time(serial, repeat)
+    results = [{'jobs': 1, 'seconds': serial_seconds, 'speedup': 1.0}]
+    for jobs in range(2, max_jobs + 1):
+        function = parallel(jobs)
+        if function() != expected:
+            raise AssertionError(f'output with {jobs} jobs differs from serial')
+        seconds = best_time(function, repeat)
+        results.append({'jobs': jobs, 'seconds': seconds,
+                        'speedup': serial_seconds / seconds})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--skills', type=int, default=20000,
+                        help='Number of skill lines in the synthetic sheet.')
+    parser.add_argument('--max-jobs', type=int, default=os.cpu_count() or 1,
+                        help='Largest number of jobs to measure.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs; the best one is reported.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the synthetic sheet.')
+    parser.add_argument('--template', action='store_true',
+                        help='Render cards from precompiled templates.')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as json.')
+    params = parser.parse_args()
+
+    results = run(params.skills, params.max_jobs, params.repeat, params.seed,
+                  params.template)
+    if params.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f'{"jobs":>6}{"seconds":>10}{"speedup":>10}')
+    for result in results:
+        print(f'{result["jobs"]:>6}{result["seconds"]:>10.3f}'
+              f'{result["speedup"]:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,105 @@
 from skill_cards_generator.skill_crawler import main
+from skill_cards_generator.parse_cache import default_max_entries
+from pathlib import Path
+from typing import List
 import argparse
+import sys
+
+catalog_commands = ('parse', 'render')
+
+# Options which every mode uses, by their dest
+common_options = {'sleeve', 'large', 'sl_as_limitation', 'template',
+                  'compact', 'gzip'}
+# Options which each mode uses besides the common ones
+mode_options = {
+    'serve': {'serve', 'port', 'fragment_cache'},
+    'watch': {'watch', 'files', 'output', 'fragment_cache'},
+    'dump': {'dump', 'output_dir', 'section', 'cache', 'cache_size',
+             'fragment_cache'},
+    'batch': {'files', 'input_dir', 'output_dir', 'workers', 'cache',
+              'cache_size', 'fragment_cache', 'dedup', 'duplicates',
+              'link_css'},
+    'stdin': {'output_dir', 'pages_per_file', 'jobs', 'cache', 'cache_size',
+              'fragment_cache', 'profile'},
+}
+mode_names = {
+    'serve': 'with --serve',
+    'watch': 'with --watch',
+    'dump': 'with --dump',
+    'batch': 'in batch mode',
+    'stdin': 'with a sheet from stdin',
+}
+
+
+def option_name(dest: str) -> str:
+    return 'sheet files' if dest == 'files' else '--' + dest.replace('_', '-')
+
+
+def run_catalog_command(args: List[str]) -> None:
+    """Run a subcommand converting sheets into a catalog or a catalog into html."""
+    parser = argparse.ArgumentParser(prog='main.py')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    parse_parser = subparsers.add_parser(
+        'parse', help='Parse sheets into a catalog of skills.')
+    parse_parser.add_argument('files', nargs='*', type=Path,
+                              help='Sheet files to parse (stdin if omitted).')
+    parse_parser.add_argument('-o', '--output', type=Path,
+                              help='Catalog file to write (stdout if omitted).')
+    parse_parser.add_argument('--binary', action='store_true',
+                              help='Write a binary catalog instead of JSONL.')
+    parse_parser.add_argument('--sl-as-limitation', action='store_true',
+                              help='Treat sl as sl limitation.')
+    parse_parser.add_argument('--cache', type=Path,
+                              help='Cache parsed skills in this file.')
+    parse_parser.add_argument('--cache-size', type=int, default=default_max_entries,
+                              help='Maximum number of skills kept in the cache.')
+    render_parser = subparsers.add_parser(
+        'render', help='Render a catalog of skills into html.')
+    render_parser.add_argument('catalog', nargs='?', type=Path,
+                               help='Catalog file to render (stdin if omitted).')
+    render_parser.add_argument('-o', '--output', type=Path,
+                               help='Html file to write (stdout if omitted).')
+    render_parser.add_argument('--sleeve', action='store_true',
+                               help='Print for sleeves.')
+    render_parser.add_argument('--large', action='store_true',
+                               help='Enlarge skill names.')
+    render_parser.add_argument('--template', action='store_true',
+                               help='Render cards from precompiled templates.')
+    render_parser.add_argument('--fragment-cache', type=Path, metavar='PATH',
+                               help='Cache rendered cards in this file.')
+    render_parser.add_argument('--compact', action='store_true',
+                               help='Write html without indentation and css '
+                                    'minified.')
+    render_parser.add_argument('--gzip', action='store_true',
+                               help='Write gzipped html.')
+    render_parser.add_argument('--source', action='append', default=[],
+                               help='Render only skills of this sheet.')
+    render_parser.add_argument('--name', action='append', default=[],
+                               help='Render only skills of this name.')
+    params = parser.parse_args(args)
+
+    from skill_cards_generator.catalog import (
+        CatalogError, parse_to_catalog, render_catalog)
+    if params.command == 'parse':
+        num_skills = parse_to_catalog(
+            params.files, params.output, params.binary,
+            params.sl_as_limitation, params.cache, params.cache_size)
+        print(f'{num_skills} skills', file=sys.stderr)
+    else:
+        try:
+            render_catalog(params.catalog, params.output, params.sleeve,
+                           params.large, params.template,
+                           params.fragment_cache, params.source, params.name,
+                           params.compact, params.gzip)
+        except CatalogError as error:
+            parser.exit(1, f'{parser.prog}: error: {error}\n')
+
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in catalog_commands:
+        run_catalog_command(sys.argv[1:])
+        sys.exit()
+
     parser = argparse.ArgumentParser()
     parser.add_argument('--sleeve', action='store_true',
                         help='Print for sleeves.')
@@ -9,6 +107,166 @@ if __name__ == "__main__":
                         help='Enlarge skill names.')
     parser.add_argument('--sl-as-limitation', action='store_true',
                         help='Treat sl as sl limitation.')
+    parser.add_argument('--template', action='store_true',
+                        help='Render cards from precompiled templates.')
+    parser.add_argument('files', nargs='*', type=Path, default=[],
+                        help='Sheet files to convert in batch mode.')
+    parser.add_argument('--input-dir', type=Path,
+                        help='Convert all *.txt sheets in this directory.')
+    parser.add_argument('--output-dir', type=Path,
+                        help='Directory to write html files in batch mode, or '
+                             'files of pages of the sheet from stdin.')
+    parser.add_argument('--pages-per-file', type=int,
+                        help='Number of pages in each file written into '
+                             '--output-dir from stdin.')
+    parser.add_argument('--workers', type=int,
+                        help='Number of worker processes in batch mode.')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of processes parsing and rendering a sheet '
+                             'from stdin.')
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument('--watch', action='store_true',
+                       help='Render the sheet file again whenever it is changed.')
+    parser.add_argument('--output', type=Path,
+                        help='Html file to write in watch mode.')
+    parser.add_argument('--fragment-cache', type=Path, metavar='PATH',
+                        help='Cache rendered cards in this file.')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Parse and render each distinct skill once in batch mode.')
+    parser.add_argument('--duplicates', type=Path, metavar='PATH',
+                        help='Write a json report of duplicated skills in batch '
+                             'mode (implies --dedup).')
+    modes.add_argument('--dump', type=Path,
+                       help='Render each skill section of a file of many '
+                            'sheets into --output-dir.')
+    parser.add_argument('--section', type=int, action='append', default=[],
+                        help='Render only this section of --dump.')
+    parser.add_argument('--cache', type=Path,
+                        help='Cache parsed skills in this file.')
+    parser.add_argument('--cache-size', type=int, default=default_max_entries,
+                        help='Maximum number of skills kept in the cache.')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='PATH',
+                        help='Write a json report of each stage into PATH '
+                             '(stderr if omitted).')
+    modes.add_argument('--serve', action='store_true',
+                       help='Serve rendering over http on localhost, rendering '
+                            'with the given options unless a request asks '
+                            'otherwise.')
+    parser.add_argument('--port', type=int, default=8080,
+                        help='Port to listen on in server mode.')
+    parser.add_argument('--compact', action='store_true',
+                        help='Write html without indentation and css minified.')
+    parser.add_argument('--link-css', action='store_true',
+                        help='Write the css once into --output-dir and link it '
+                             'in batch mode.')
+    parser.add_argument('--gzip', action='store_true',
+                        help='Write gzipped html into stdout, *.html.gz in '
+                             'batch and dump modes, or gzipped responses in '
+                             'server mode.')
     params = parser.parse_args()
+    if params.serve:
+        mode = 'serve'
+    elif params.watch:
+        mode = 'watch'
+    elif params.dump is not None:
+        mode = 'dump'
+    elif params.files or params.input_dir is not None:
+        mode = 'batch'
+    else:
+        mode = 'stdin'
+    # Flags which the mode would silently ignore are refused
+    for dest, value in sorted(vars(params).items()):
+        if dest not in common_options and dest not in mode_options[mode] \
+                and value != parser.get_default(dest):
+            parser.error(f'{option_name(dest)} can not be used {mode_names[mode]}')
+    if params.jobs < 1 or (params.workers is not None and params.workers < 1):
+        parser.error('--jobs and --workers need a positive number')
+    if params.gzip and mode == 'stdin' and params.output_dir is not None:
+        parser.error('--gzip can not be used with --output-dir of a sheet '
+                     'from stdin')
+    if params.pages_per_file is not None:
+        if params.output_dir is None or params.pages_per_file < 1:
+            parser.error('--pages-per-file needs --output-dir and a positive number')
 
-    main(params.sleeve, params.large, params.sl_as_limitation)
+    # Modules only for other modes are imported on demand to start fast
+    if mode == 'serve':
+        from skill_cards_generator.server import RenderOptions, serve
+        serve(params.port,
+              defaults=RenderOptions(params.sleeve, params.large,
+                                     params.sl_as_limitation, params.template,
+                                     params.compact),
+              compress=params.gzip, fragment_cache_path=params.fragment_cache)
+    elif mode == 'watch':
+        from skill_cards_generator.watch import watch
+        if len(params.files) != 1 or params.output is None:
+            parser.error('--watch needs a sheet file and --output')
+        watch(params.files[0], params.output, params.sleeve, params.large,
+              params.sl_as_limitation, params.template,
+              compact=params.compact, compress=params.gzip,
+              fragment_cache_path=params.fragment_cache)
+    elif mode == 'dump':
+        if params.output_dir is None:
+            parser.error('--output-dir is required with --dump')
+        from skill_cards_generator.dump import SheetDump, missing_sections, render_dump
+        with SheetDump(params.dump) as dump:
+            missing = missing_sections(dump, params.section)
+            if missing:
+                parser.error(f'{params.dump} has {len(dump)} sections, so there is '
+                             f'no section {", ".join(map(str, missing))}')
+            render_dump(dump, params.output_dir, params.sleeve,
+                        params.large, params.sl_as_limitation, params.template,
+                        params.section, params.cache, params.cache_size,
+                        compact=params.compact, compress=params.gzip,
+                        fragment_cache_path=params.fragment_cache)
+    elif mode == 'batch':
+        if params.output_dir is None:
+            parser.error('--output-dir is required in batch mode')
+        from skill_cards_generator.batch import collect_inputs, duplicate_stems, run_batch
+        inputs = collect_inputs(params.input_dir, params.files)
+        duplicates = duplicate_stems(inputs)
+        if duplicates:
+            parser.error('sheets with the same name would be written into the '
+                         f'same html file: {", ".join(duplicates)}')
+        results = run_batch(
+            inputs,
+            params.output_dir, params.sleeve, params.large,
+            params.sl_as_limitation, params.template, params.workers,
+            params.cache, params.cache_size,
+            params.dedup or params.duplicates is not None,
+            params.fragment_cache, compact=params.compact,
+            link_css=params.link_css, compress=params.gzip)
+        if params.duplicates is not None:
+            from skill_cards_generator.dedup import merge_occurrences, write_duplicates_report
+            write_duplicates_report(
+                merge_occurrences(result.occurrences for result in results
+                                  if result.occurrences is not None),
+                params.duplicates)
+        if any(result.error is not None for result in results):
+            sys.exit(1)
+    elif params.jobs > 1:
+        if params.cache is not None or params.fragment_cache is not None \
+                or params.profile is not None or params.output_dir is not None:
+            parser.error('--jobs can not be used with caches, --profile or '
+                         '--output-dir')
+        from skill_cards_generator.parallel import write_html_parallel
+        stream = sys.stdout
+        if params.gzip:
+            from skill_cards_generator.html_generator import gzip_stream
+            stream = gzip_stream(sys.stdout.buffer)
+        with stream:
+            write_html_parallel(sys.stdin.read(), stream, params.sleeve,
+                                params.large, params.sl_as_limitation,
+                                params.template, params.jobs, params.compact)
+    elif params.profile is not None:
+        from skill_cards_generator.profiler import Profiler
+        with Profiler() as profiler:
+            main(params.sleeve, params.large, params.sl_as_limitation,
+                 params.template, params.cache, params.cache_size,
+                 params.fragment_cache, params.output_dir,
+                 params.pages_per_file, params.compact, params.gzip)
+        profiler.write_report(params.profile)
+    else:
+        main(params.sleeve, params.large, params.sl_as_limitation,
+             params.template, params.cache, params.cache_size,
+             params.fragment_cache, params.output_dir, params.pages_per_file,
+             params.compact, params.gzip)
@@ -0,0 +1,196 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from sys import stderr
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, TextIO, Iterator
+import time
+from .skill import Skill
+from .skill_crawler import iter_skills
+from .html_generator import (
+    open_html, render_card, split_pages, write_html, write_pages, write_stylesheet)
+from .parse_cache import ParseCache, default_max_entries
+from .dedup import SkillOccurrences, SkillStore
+from .fragment_cache import FragmentCache
+
+
+@dataclass
+class BatchResult:
+    """Result of converting one sheet in a batch."""
+
+    input_path: Path
+    output_path: Path
+    num_skills: int = 0
+    error: Optional[str] = None
+    occurrences: Optional[Dict[str, SkillOccurrences]] = None
+
+
+# Skills shared by all sheets converted in a process with dedup
+_skill_store: Optional[SkillStore] = None
+
+
+def get_skill_store() -> SkillStore:
+    global _skill_store
+    if _skill_store is None:
+        _skill_store = SkillStore()
+    return _skill_store
+
+
+def _counted(skills: Iterable[Skill], result: BatchResult) -> Iterator[Skill]:
+    for skill in skills:
+        result.num_skills += 1
+        yield skill
+
+
+def convert_file(
+    input_path: Path,
+    output_path: Path,
+    is_sleeve_mode: bool,
+    large: bool,
+    sl_as_limit: bool,
+    use_template: bool = False,
+    cache_path: Optional[Path] = None,
+    cache_size: int = default_max_entries,
+    dedup: bool = False,
+    fragment_cache_path: Optional[Path] = None,
+    compact: bool = False,
+    stylesheet: Optional[str] = None,
+    compress: bool = False
+) -> BatchResult:
+    """Convert a sheet file into a html file.
+
+    With dedup, skills are parsed and rendered through the store shared by
+    the sheets converted in this process, and their occurrences are counted.
+    The html file links stylesheet if it is given, and is gzipped if
+    compress is set.
+    """
+    result = BatchResult(input_path, output_path)
+    cache = None
+    fragment_cache = None
+    store = get_skill_store() if dedup else None
+    try:
+        if cache_path is not None:
+            cache = ParseCache(cache_path, cache_size)
+        if fragment_cache_path is not None:
+            fragment_cache = FragmentCache(fragment_cache_path)
+        with input_path.open('r', encoding='utf-8') as input_file, \
+                open_html(output_path, compress) as output_file:
+            if store is None:
+                skills = _counted(
+                    iter_skills(input_file, sl_as_limit, cache), result)
+                writer = write_html
+                if fragment_cache is not None:
+                    writer = fragment_cache.write_html
+                writer(skills, output_file, is_sleeve_mode, large, use_template,
+                       compact, stylesheet)
+            else:
+                store.set_backing_cache(cache)
+                skills = _counted(store.collect(
+                    iter_skills(input_file, sl_as_limit, store),
+                    str(input_path)), result)
+                render = render_card
+                if fragment_cache is not None:
+                    render = fragment_cache.render_card
+                pages = (store.render_page(page_skills, is_sleeve_mode,
+                                           large, use_template, render, compact)
+                         for page_skills in split_pages(skills))
+                write_pages(pages, output_file, is_sleeve_mode, use_template,
+                            stylesheet, compact)
+    except Exception as e:
+        result.error = f'{type(e).__name__}: {e}'
+        if output_path.exists():
+            output_path.unlink()
+    finally:
+        if store is not None:
+            store.set_backing_cache(None)
+            result.occurrences = store.take_occurrences()
+        if cache is not None:
+            cache.close()
+        if fragment_cache is not None:
+            fragment_cache.close()
+    return result
+
+
+def collect_inputs(input_dir: Optional[Path], files: Iterable[Path]) -> List[Path]:
+    inputs = list(files)
+    if input_dir is not None:
+        inputs += sorted(path for path in input_dir.glob('*.txt')
+                         if path.is_file())
+    return inputs
+
+
+def duplicate_stems(inputs: Iterable[Path]) -> List[str]:
+    """Return the stems shared by several inputs, whose outputs would clash."""
+    counts = Counter(input_path.stem for input_path in inputs)
+    return sorted(stem for stem, count in counts.items() if count > 1)
+
+
+def run_batch(
+    inputs: Iterable[Path],
+    output_dir: Path,
+    is_sleeve_mode: bool,
+    large: bool,
+    sl_as_limit: bool,
+    use_template: bool = False,
+    workers: Optional[int] = None,
+    cache_path: Optional[Path] = None,
+    cache_size: int = default_max_entries,
+    dedup: bool = False,
+    fragment_cache_path: Optional[Path] = None,
+    report: TextIO = stderr,
+    compact: bool = False,
+    link_css: bool = False,
+    compress: bool = False
+) -> List[BatchResult]:
+    """Convert sheet files into html files in output_dir in parallel.
+
+    Each result is reported as soon as it finishes, followed by the total
+    throughput. With link_css, the css is written once into output_dir and
+    linked from every html file. With compress, html files are gzipped into
+    *.html.gz.
+    """
+    inputs = list(inputs)
+    duplicates = duplicate_stems(inputs)
+    if duplicates:
+        raise ValueError(f'inputs with the same name: {", ".join(duplicates)}')
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stylesheet = None
+    if link_css:
+        stylesheet = write_stylesheet(output_dir, is_sleeve_mode, compact)
+    suffix = '.html.gz' if compress else '.html'
+    begin = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(convert_file, input_path,
+                            output_dir / (input_path.stem + suffix),
+                            is_sleeve_mode, large, sl_as_limit, use_template,
+                            cache_path, cache_size, dedup,
+                            fragment_cache_path, compact, stylesheet,
+                            compress): input_path
+            for input_path in inputs
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # e.g. the worker died, so that the pool is broken
+                input_path = futures[future]
+                result = BatchResult(input_path,
+                                     output_dir / (input_path.stem + suffix),
+                                     error=f'{type(e).__name__}: {e}')
+            if result.error is None:
+                print(f'ok: {result.input_path} -> {result.output_path} '
+                      f'({result.num_skills} skills)', file=report)
+            else:
+                print(f'failed: {result.input_path}: {result.error}',
+                      file=report)
+            results.append(result)
+    elapsed = time.perf_counter() - begin
+    num_succeeded = sum(1 for result in results if result.error is None)
+    num_skills = sum(result.num_skills for result in results
+                     if result.error is None)
+    print(f'{num_succeeded}/{len(results)} sheets, {num_skills} skills '
+          f'in {elapsed:.2f}s ({len(results) / elapsed:.1f} sheets/s, '
+          f'{num_skills / elapsed:.1f} skills/s)', file=report)
+    return results
@@ -0,0 +1,239 @@
+import re
+from typing import NamedTuple, Optional, Sequence, Match, Tuple
+from .skill import Skill
+from .layout import title_font_sizes, effect_font_size
+from .zenhan import zen_number
+
+
+# Precompiled markup of a document, as yattag would indent it
+skeleton_before_body = (
+    '<!DOCTYPE html>\n'
+    '<html>\n'
+    '  <head>\n'
+    '    <meta charset="utf-8" />\n'
+    '    <title>Arianrhod Skill Cards</title>\n'
+    '    <meta name="viewport" content="width=device-width, initial-scale=1" />\n'
+    '    <style type="text/css">{css}</style>\n'
+    '  </head>\n'
+    '  '
+)
+skeleton_after_body = '\n</html>'
+linked_skeleton_before_body = skeleton_before_body.replace(
+    '<style type="text/css">{css}</style>',
+    '<link rel="stylesheet" href="{href}" />')
+
+# Precompiled markup of a card, as yattag would indent it inside a page
+page_template = (
+    '<div class="cards-container">\n'
+    '{cards}'
+    '</div>'
+)
+card_template = (
+    '  <div class="card-outline-box">\n'
+    '    <div class="card-title-box">\n'
+    '{skill_class}'
+    '{skill_name}'
+    '    </div>\n'
+    '    <div class="card-border"></div>\n'
+    '    <div class="card-main-box">\n'
+    '      <p class="timing">{timing}</p>\n'
+    '      <div class="inner-horizontal-box">\n'
+    '        <p class="judge">{judge}</p>\n'
+    '        <p class="target">{target}</p>\n'
+    '      </div>\n'
+    '      <div class="inner-horizontal-box">\n'
+    '        <p class="effect-range">{skill_range}</p>\n'
+    '        <p class="skill-cost">{cost}</p>\n'
+    '      </div>\n'
+    '{level_now}'
+    '{level_above}'
+    '      <p class="limitation">{limitation}</p>\n'
+    '      <p class="effect"{effect_style}>{effect}</p>\n'
+    '{critical}'
+    '{flavor}'
+    '    </div>\n'
+    '  </div>\n'
+)
+skill_class_template = '      <h3 class="skill-class" style="font-size: {size}mm;">{text}</h3>\n'
+skill_name_open_tag = '<h2 class="skill-name" style="font-size: {size}mm;">'
+skill_name_template = '      ' + skill_name_open_tag + '{html}</h2>\n'
+skill_name_indentation = '      '
+level_now_template = '      <p class="skill-level-now">{text}</p>\n'
+level_above_template = '      <p class="skill-level-bound">{text}</p>\n'
+critical_template = '      <p class="critical"{style}>{text}</p>\n'
+flavor_template = '      <p class="flavor"{style}>{text}</p>\n'
+effect_style_template = ' style="font-size: {size}mm;"'
+
+
+# Indentation and line breaks between tags and placeholders of templates
+markup_gap_regex = re.compile(r'^ +|\n *|(?<=\}) +(?=<)')
+
+
+def compact_markup(template: str) -> str:
+    """Drop the indentation and the line breaks of a markup template."""
+    return markup_gap_regex.sub('', template)
+
+
+class CardMarkup(NamedTuple):
+    """Templates of a page and the parts of its cards."""
+
+    page: str
+    card: str
+    skill_class: str
+    skill_name: str
+    level_now: str
+    level_above: str
+    critical: str
+    flavor: str
+
+
+indented_markup = CardMarkup(
+    page_template, card_template, skill_class_template, skill_name_template,
+    level_now_template, level_above_template, critical_template,
+    flavor_template)
+# Markup of compact output, without whitespace between tags
+compact_card_markup = CardMarkup(*map(compact_markup, indented_markup))
+compact_skeleton_before_body = compact_markup(skeleton_before_body)
+compact_linked_skeleton_before_body = compact_markup(linked_skeleton_before_body)
+compact_skeleton_after_body = compact_markup(skeleton_after_body)
+
+text_run_regex = re.compile(r'(?:^|(?<=>))[^<>]+')
+ruby_regex = re.compile(r'<ruby>.*?</ruby>')
+
+
+def escape(text: str) -> str:
+    """Escape a text node like yattag, dropping it if it is blank."""
+    if not text.strip():
+        return ''
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def generate_skeleton_from_template(css: str, compact: bool = False) -> Tuple[str, str]:
+    """Generate the html before and after the contents of body from templates.
+
+    The result is the same as html_generator.generate_skeleton, or without
+    indentation if compact is set.
+    """
+    css = css.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    if compact:
+        return (compact_skeleton_before_body.format(css=css),
+                compact_skeleton_after_body)
+    return skeleton_before_body.format(css=css), skeleton_after_body
+
+
+def generate_linked_skeleton_from_template(
+    href: str,
+    compact: bool = False
+) -> Tuple[str, str]:
+    """Generate the skeleton linking a stylesheet from templates.
+
+    The result is the same as html_generator.generate_linked_skeleton, or
+    without indentation if compact is set.
+    """
+    href = href.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;') \
+        .replace('"', '&quot;')
+    if compact:
+        return (compact_linked_skeleton_before_body.format(href=href),
+                compact_skeleton_after_body)
+    return linked_skeleton_before_body.format(href=href), skeleton_after_body
+
+
+def _drop_blank_text_run(match: Match[str]) -> str:
+    if not match.group().strip():
+        return ''
+    return match.group()
+
+
+def render_skill_name(skill: Skill, size: float, compact: bool = False) -> Optional[str]:
+    """Render the name of a skill, or None if it cannot be templated."""
+    if '<' in str(skill.name) or '>' in str(skill.name):
+        return None
+    html = skill.name.as_html()
+    if compact:
+        return compact_card_markup.skill_name.format(size=size, html=html)
+    if ruby_regex.sub('', html).strip():
+        # The name is kept in a line since it directly contains text
+        return skill_name_template.format(
+            size=size, html=text_run_regex.sub(_drop_blank_text_run, html))
+    from yattag import indent
+    name_tag = indent(skill_name_open_tag.format(size=size) + html + '</h2>')
+    return ''.join(skill_name_indentation + name_line + '\n'
+                   for name_line in name_tag.split('\n'))
+
+
+def render_card(
+    skill: Skill,
+    is_sleeve_mode: bool,
+    large: bool,
+    compact: bool = False
+) -> Optional[str]:
+    """Render a card of a skill, or None if it cannot be templated."""
+    markup = compact_card_markup if compact else indented_markup
+    class_size, skill_size = title_font_sizes(skill, is_sleeve_mode, large)
+    skill_name = render_skill_name(skill, skill_size, compact)
+    if skill_name is None:
+        return None
+    skill_class = ''
+    if skill.skill_class is not None:
+        skill_class = markup.skill_class.format(
+            size=class_size, text=escape(str(skill.skill_class)))
+    level_now = ''
+    if skill.level_now is not None:
+        level_now = markup.level_now.format(
+            text=zen_number(skill.level_now))
+    level_above = ''
+    if skill.level_above is not None:
+        level_above = markup.level_above.format(
+            text=zen_number(skill.level_above))
+    limitation = 'ー'
+    if skill.usage_limitation is not None:
+        limitation = escape(skill.usage_limitation)
+    effect_size = effect_font_size(skill, is_sleeve_mode)
+    effect_style = ''
+    if effect_size is not None:
+        effect_style = effect_style_template.format(size=effect_size)
+    critical = ''
+    if skill.critical is not None:
+        critical = markup.critical.format(
+            style=effect_style, text=escape(skill.critical))
+    flavor = ''
+    if skill.flavor is not None:
+        flavor = markup.flavor.format(
+            style=effect_style, text=escape(skill.flavor))
+    return markup.card.format(
+        skill_class=skill_class,
+        skill_name=skill_name,
+        timing=escape(skill.timing),
+        judge=escape(str(skill.judge)),
+        target=escape(str(skill.target)),
+        skill_range=escape(str(skill.skill_range)),
+        cost=escape(str(skill.cost)),
+        level_now=level_now,
+        level_above=level_above,
+        limitation=limitation,
+        effect_style=effect_style,
+        effect=escape(skill.effect),
+        critical=critical,
+        flavor=flavor,
+    )
+
+
+def generate_page_from_template(
+    skills: Sequence[Skill],
+    is_sleeve_mode: bool,
+    large: bool,
+    compact: bool = False
+) -> Optional[str]:
+    """Generate an indented cards-container of given skills from templates.
+
+    The result is the same as html_generator.generate_page, or None if
+    a skill name contains markup which cannot be templated.
+    """
+    cards = []
+    for skill in skills:
+        card = render_card(skill, is_sleeve_mode, large, compact)
+        if card is None:
+            return None
+        cards.append(card)
+    markup = compact_card_markup if compact else indented_markup
+    return markup.page.format(cards=''.join(cards))
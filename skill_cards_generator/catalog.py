@@ -0,0 +1,359 @@
+import json
+import os
+import struct
+from contextlib import ExitStack
+from pathlib import Path
+from sys import stdin, stdout
+from typing import (
+    Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple)
+from .skill import Skill
+from .skill_record import RecordError, decode_record, encode_record
+from .normalized_check import normalize
+from .skill_crawler import iter_skills
+from .html_generator import open_html, write_html
+from .parse_cache import ParseCache, default_max_entries
+
+
+# A catalog holds parsed skills, so that they can be rendered without
+# parsing the sheets again. Each skill is a record of skill_record, after
+# the index of the sheet it came from.
+#
+# JSONL: a header line and a line of a record for each skill.
+# Binary: binary_magic and frames of a kind byte, a little-endian uint32
+# length and a payload, written as skills are parsed:
+#   H  the header as UTF-8 JSON, first and once
+#   S  a UTF-8 string, appended to the table of strings
+#   R  a record, as one packed value
+# A packed value is a tag byte and its data:
+#   N  None, T  True, F  False
+#   I  an int as little-endian int64
+#   S  a string as uint32 index into the table, defined by an earlier frame
+#   L  a list as uint32 count followed by its packed values
+catalog_format = 'skill-catalog'
+catalog_version = 1
+binary_magic = b'SKCAT\x02'
+frame_struct = struct.Struct('<cI')
+int_struct = struct.Struct('<q')
+count_struct = struct.Struct('<I')
+
+
+class CatalogError(Exception):
+    pass
+
+
+def encode_skill(skill: Skill, source: int) -> List[Any]:
+    """Encode a skill into a catalog record, after the index of its sheet."""
+    return [source] + encode_record(skill)
+
+
+def decode_skill(record: Any) -> Tuple[int, Skill]:
+    """Decode a catalog record into the index of its sheet and its skill."""
+    if not isinstance(record, list) or not record or not isinstance(record[0], int):
+        raise CatalogError('broken record: no index of sheet')
+    try:
+        return record[0], decode_record(record[1:])
+    except RecordError as error:
+        raise CatalogError(str(error)) from None
+
+
+def _header(sources: List[str]) -> Dict[str, Any]:
+    return {'format': catalog_format, 'version': catalog_version,
+            'sources': sources}
+
+
+def _check_header(header: Any) -> List[str]:
+    if (not isinstance(header, dict)
+            or header.get('format') != catalog_format
+            or header.get('version') != catalog_version):
+        raise CatalogError('not a skill catalog of a supported version')
+    return header['sources']
+
+
+def write_jsonl(
+    sourced_skills: Iterable[Tuple[int, Skill]],
+    sources: List[str],
+    stream: TextIO
+) -> int:
+    """Write a catalog as JSONL one skill by one, returning the count."""
+    stream.write(json.dumps(_header(sources), ensure_ascii=False) + '\n')
+    num_skills = 0
+    for source, skill in sourced_skills:
+        stream.write(json.dumps(encode_skill(skill, source),
+                                ensure_ascii=False, separators=(',', ':')))
+        stream.write('\n')
+        num_skills += 1
+    return num_skills
+
+
+def _write_frame(stream: BinaryIO, kind: bytes, payload: bytes) -> None:
+    stream.write(frame_struct.pack(kind, len(payload)))
+    stream.write(payload)
+
+
+def _pack(value: Any, buffer: bytearray, intern: Callable[[str], int]) -> None:
+    if value is None:
+        buffer += b'N'
+    elif value is True:
+        buffer += b'T'
+    elif value is False:
+        buffer += b'F'
+    elif isinstance(value, int):
+        buffer += b'I'
+        buffer += int_struct.pack(value)
+    elif isinstance(value, str):
+        buffer += b'S'
+        buffer += count_struct.pack(intern(value))
+    else:
+        buffer += b'L'
+        buffer += count_struct.pack(len(value))
+        for element in value:
+            _pack(element, buffer, intern)
+
+
+def _unpack(data: bytes, offset: int, strings: List[str]) -> Tuple[Any, int]:
+    tag = data[offset:offset + 1]
+    offset += 1
+    if tag == b'N':
+        return None, offset
+    if tag == b'T':
+        return True, offset
+    if tag == b'F':
+        return False, offset
+    if tag == b'I':
+        return int_struct.unpack_from(data, offset)[0], offset + int_struct.size
+    if tag == b'S':
+        index, = count_struct.unpack_from(data, offset)
+        return strings[index], offset + count_struct.size
+    if tag == b'L':
+        count, = count_struct.unpack_from(data, offset)
+        offset += count_struct.size
+        values = []
+        for _ in range(count):
+            value, offset = _unpack(data, offset, strings)
+            values.append(value)
+        return values, offset
+    raise CatalogError(f'unknown value tag: {tag!r}')
+
+
+def write_binary(
+    sourced_skills: Iterable[Tuple[int, Skill]],
+    sources: List[str],
+    stream: BinaryIO
+) -> int:
+    """Write a catalog in the binary format one skill by one, returning the count.
+
+    Each string is written once, just before the first record using it.
+    """
+    string_indices: Dict[str, int] = {}
+
+    def intern(string: str) -> int:
+        index = string_indices.get(string)
+        if index is None:
+            index = string_indices[string] = len(string_indices)
+            _write_frame(stream, b'S', string.encode('utf-8'))
+        return index
+
+    stream.write(binary_magic)
+    _write_frame(stream, b'H', json.dumps(
+        _header(sources), ensure_ascii=False).encode('utf-8'))
+    num_skills = 0
+    for source, skill in sourced_skills:
+        buffer = bytearray()
+        _pack(encode_skill(skill, source), buffer, intern)
+        _write_frame(stream, b'R', bytes(buffer))
+        num_skills += 1
+    return num_skills
+
+
+def _read_frame(stream: BinaryIO) -> Optional[Tuple[bytes, bytes]]:
+    head = stream.read(frame_struct.size)
+    if not head:
+        return None
+    if len(head) < frame_struct.size:
+        raise CatalogError('broken binary catalog')
+    kind, length = frame_struct.unpack(head)
+    payload = stream.read(length)
+    if len(payload) < length:
+        raise CatalogError('broken binary catalog')
+    return kind, payload
+
+
+def _iter_binary(stream: BinaryIO) -> Iterator[Tuple[int, Skill]]:
+    strings: List[str] = []
+    num_records = 0
+    while True:
+        frame = _read_frame(stream)
+        if frame is None:
+            return
+        kind, payload = frame
+        if kind == b'S':
+            try:
+                strings.append(payload.decode('utf-8'))
+            except ValueError:
+                raise CatalogError(f'string {len(strings) + 1}: not UTF-8')
+        elif kind == b'R':
+            num_records += 1
+            try:
+                record, end = _unpack(payload, 0, strings)
+                if end != len(payload):
+                    raise CatalogError('trailing data')
+                sourced_skill = decode_skill(record)
+            except (CatalogError, IndexError, RecursionError,
+                    struct.error) as error:
+                raise CatalogError(f'record {num_records}: {error}') from None
+            yield sourced_skill
+        else:
+            raise CatalogError(f'unknown frame kind: {kind!r}')
+
+
+def read_catalog(stream: BinaryIO) -> Tuple[List[str], Iterator[Tuple[int, Skill]]]:
+    """Read the sources and the skills of a catalog in either format.
+
+    Skills are decoded one by one as they are iterated.
+    """
+    prefix = stream.read(len(binary_magic))
+    if prefix == binary_magic:
+        frame = _read_frame(stream)
+        if frame is None or frame[0] != b'H':
+            raise CatalogError('broken binary catalog')
+        try:
+            header = json.loads(frame[1].decode('utf-8'))
+        except ValueError:
+            raise CatalogError('broken binary catalog')
+        return _check_header(header), _iter_binary(stream)
+    if prefix.startswith(binary_magic[:-1]):
+        raise CatalogError('not a skill catalog of a supported version')
+    first_line = prefix + stream.readline()
+    try:
+        header = json.loads(first_line.decode('utf-8'))
+    except ValueError:
+        raise CatalogError('not a skill catalog')
+    return _check_header(header), _iter_jsonl(stream)
+
+
+def _iter_jsonl(stream: BinaryIO) -> Iterator[Tuple[int, Skill]]:
+    # Line numbers count the header as the first line
+    for line_number, line in enumerate(stream, 2):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line.decode('utf-8'))
+        except (ValueError, RecursionError) as error:
+            raise CatalogError(f'line {line_number}: {error}') from None
+        try:
+            sourced_skill = decode_skill(record)
+        except CatalogError as error:
+            raise CatalogError(f'line {line_number}: {error}') from None
+        yield sourced_skill
+
+
+def _iter_sheets(
+    inputs: Sequence[Path],
+    sl_as_limit: bool,
+    cache: Optional[ParseCache]
+) -> Iterator[Tuple[int, Skill]]:
+    if not inputs:
+        for skill in iter_skills(stdin, sl_as_limit, cache):
+            yield 0, skill
+        return
+    for source, input_path in enumerate(inputs):
+        with input_path.open('r', encoding='utf-8') as input_file:
+            for skill in iter_skills(input_file, sl_as_limit, cache):
+                yield source, skill
+
+
+def parse_to_catalog(
+    inputs: Sequence[Path],
+    output_path: Optional[Path],
+    binary: bool,
+    sl_as_limit: bool,
+    cache_path: Optional[Path] = None,
+    cache_size: int = default_max_entries
+) -> int:
+    """Parse sheets (stdin if no inputs) into a catalog, returning the count.
+
+    The catalog is written into output_path, or stdout if it is None.
+    """
+    sources = [str(path) for path in inputs] or ['-']
+    with ExitStack() as stack:
+        cache = None
+        if cache_path is not None:
+            cache = stack.enter_context(ParseCache(cache_path, cache_size))
+        sourced_skills = _iter_sheets(inputs, sl_as_limit, cache)
+        if binary:
+            binary_stream = stdout.buffer if output_path is None \
+                else stack.enter_context(output_path.open('wb'))
+            return write_binary(sourced_skills, sources, binary_stream)
+        text_stream = stdout if output_path is None \
+            else stack.enter_context(output_path.open('w', encoding='utf-8'))
+        return write_jsonl(sourced_skills, sources, text_stream)
+
+
+def select_skills(
+    sourced_skills: Iterable[Tuple[int, Skill]],
+    all_sources: List[str],
+    sources: Sequence[str] = (),
+    names: Sequence[str] = ()
+) -> Iterator[Skill]:
+    """Select skills from given sources and with given names, if any."""
+    source_indices = {index for index, source in enumerate(all_sources)
+                      if source in sources}
+    normalized_names = {normalize(name) for name in names}
+    for source, skill in sourced_skills:
+        if sources and source not in source_indices:
+            continue
+        if names and normalize(skill.name.get_base()) not in normalized_names:
+            continue
+        yield skill
+
+
+def render_catalog(
+    catalog_path: Optional[Path],
+    output_path: Optional[Path],
+    is_sleeve_mode: bool,
+    large: bool,
+    use_template: bool = False,
+    fragment_cache_path: Optional[Path] = None,
+    sources: Sequence[str] = (),
+    names: Sequence[str] = (),
+    compact: bool = False,
+    compress: bool = False
+) -> None:
+    """Render (a subset of) a catalog into html without parsing sheets.
+
+    The catalog is read from stdin if catalog_path is None, and html is
+    written into stdout if output_path is None. Html is compact if compact
+    is set, and gzipped if compress is set. It is written into a temporary
+    file first, so nothing is left when the catalog turns out to be broken
+    in the middle.
+    """
+    with ExitStack() as stack:
+        catalog_stream = stdin.buffer if catalog_path is None \
+            else stack.enter_context(catalog_path.open('rb'))
+        all_sources, sourced_skills = read_catalog(catalog_stream)
+        skills = select_skills(sourced_skills, all_sources, sources, names)
+        writer = write_html
+        if fragment_cache_path is not None:
+            from .fragment_cache import FragmentCache
+            writer = stack.enter_context(
+                FragmentCache(fragment_cache_path)).write_html
+        if output_path is None:
+            import tempfile
+            descriptor, name = tempfile.mkstemp(suffix='.html')
+            os.close(descriptor)
+            temporary_path = Path(name)
+        else:
+            temporary_path = output_path.with_name(output_path.name + '.tmp')
+        try:
+            with open_html(temporary_path, compress) as output_stream:
+                writer(skills, output_stream, is_sleeve_mode, large,
+                       use_template, compact)
+            if output_path is None:
+                import shutil
+                with temporary_path.open('rb') as temporary:
+                    shutil.copyfileobj(temporary, stdout.buffer)
+            else:
+                os.replace(str(temporary_path), str(output_path))
+        finally:
+            if temporary_path.exists():
+                temporary_path.unlink()
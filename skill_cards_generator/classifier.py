@@ -3,7 +3,9 @@ from __future__ import annotations
 import enum
 from typing import Sequence, Optional, List, Tuple, Set
 from .element import Element
-from .normalized_check import normalize_and_check, normalize_and_compare
+from .value_object import ValueObject
+from .normalized_check import (
+    compile_table, normalize_and_check, normalize_and_compare)
 
 
 class ClassifierKind(enum.Enum):
@@ -25,30 +27,39 @@ unify_classifier_table: List[Tuple[ClassifierKind, Set[str]]] = [
     (ClassifierKind.style, {'ス', 'スタイル', '流', '流派',
                             'style', 'sty', 'stl', 'st', 'sy'}),
 ]
+unify_classifier_index = compile_table(unify_classifier_table)
 
 ignored_symbols = {',', '.', '<', '〈', '《', '[', '{', '「', '【', '『',
                    '>', '〉', '》', ']', '}', '」', '】', '』', '/'}
+ignored_symbol_index = compile_table(
+    [(smb, {smb}) for smb in sorted(ignored_symbols)])
 
 
-class Classifier:
+class Classifier(ValueObject):
+    __slots__ = ('_kind', '_elements', '_string')
+    _kind: ClassifierKind
+    _elements: Tuple[Element, ...]
+    _string: Optional[str]
+
     def __init__(
         self,
         kind: ClassifierKind,
-        elements: Sequence[Element] = None,
-        string: str = None,
+        elements: Optional[Sequence[Element]] = None,
+        string: Optional[str] = None,
     ) -> None:
-        self._kind = kind
-        if self._kind is ClassifierKind.spell:
-            self._elements: List[Element]
-            if elements is None:
-                self._elements = []
-            else:
-                self._elements = list(elements)
-        if self._kind is ClassifierKind.string:
+        elements_tuple: Tuple[Element, ...] = ()
+        if kind is ClassifierKind.spell and elements is not None:
+            elements_tuple = tuple(elements)
+        if kind is ClassifierKind.string:
             assert string is not None
-            self._string = string
+        else:
+            string = None
+        self._assign(_kind=kind, _elements=elements_tuple, _string=string)
+
+    def _args(self) -> Tuple[ClassifierKind, Tuple[Element, ...], Optional[str]]:
+        return self._kind, self._elements, self._string
 
-    def __str__(self) -> str:
+    def _to_str(self) -> str:
         if self._kind is ClassifierKind.spell:
             if self._elements:
                 return '魔術〈' + '／'.join([str(elem) for elem in self._elements]) + '〉'
@@ -67,9 +78,9 @@ class Classifier:
 
     @staticmethod
     def from_text(text: str) -> Optional[Classifier]:
-        kind = normalize_and_check(text, unify_classifier_table)
+        kind = normalize_and_check(text, unify_classifier_index)
         if kind is not None:
-            return Classifier(kind)
+            return Classifier.interned(kind)
         magic_specifiers = sorted(list(magic_set),
                                   key=lambda x: len(x), reverse=True)
         for magic_specifier in magic_specifiers:
@@ -82,8 +93,7 @@ class Classifier:
             return None
         elements: List[Element] = []
         for char in remain:
-            symbol = normalize_and_check(
-                char, [(smb, set([smb])) for smb in ignored_symbols])
+            symbol = normalize_and_check(char, ignored_symbol_index)
             if symbol is not None:
                 continue
             elem = Element.from_text(char)
@@ -92,4 +102,4 @@ class Classifier:
                 continue
             return None
         if elements:
-            return Classifier(ClassifierKind.spell, elements)
+            return Classifier.interned(ClassifierKind.spell, tuple(elements))
@@ -1,39 +1,47 @@
 from __future__ import annotations
 
 import re
-import mojimoji
-from .normalized_check import normalize_and_compare
+from typing import Tuple
+from .normalized_check import normalize
+from .value_object import ValueObject
+from .zenhan import han_to_zen_token, zen_number
 
 
 fate_regex = re.compile(r'[fフ]a?t?e?ェ?イ?ト?([0-9０１２３４５６７８９]+)点?', re.IGNORECASE)
+no_cost_set = {normalize(text) for text in ['', '-', '無', 'なし', '無し']}
 
 
-class Cost:
+class Cost(ValueObject):
+    __slots__ = ('_val', '_is_fate')
+    _val: int
+    _is_fate: bool
+
     def __init__(self, val: int, is_fate: bool = False) -> None:
-        self._val = val
-        self._is_fate = is_fate
+        self._assign(_val=val, _is_fate=is_fate)
+
+    def _args(self) -> Tuple[int, bool]:
+        return self._val, self._is_fate
 
-    def __str__(self):
+    def _to_str(self) -> str:
         if self._val == 0 or self._is_fate:
             return 'ー'
         else:
-            return mojimoji.han_to_zen(str(self._val))
+            return zen_number(self._val)
 
     def as_effect(self) -> str:
         if self._is_fate:
-            return mojimoji.han_to_zen(f'フェイトを{self._val}点消費。')
+            return han_to_zen_token(f'フェイトを{self._val}点消費。')
         return ''
 
     @staticmethod
     def from_text(text: str) -> Cost:
-        for candidate in ['', '-', '無', 'なし', '無し']:
-            if normalize_and_compare(text, candidate):
-                return Cost(0)
+        if normalize(text) in no_cost_set:
+            return Cost.interned(0)
         match = fate_regex.match(text)
         if match is not None:
-            return Cost(int(match.group(1)), True)
+            return Cost.interned(int(match.group(1)), True)
         try:
             cost = int(text)
-            return Cost(cost)
+            return Cost.interned(cost)
         except ValueError:
-            return Cost(0)
+            return Cost.interned(0)
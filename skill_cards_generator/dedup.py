@@ -0,0 +1,187 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from .skill import Skill
+from .parse_cache import SkillCache
+from .html_generator import render_card, join_cards
+
+
+Fingerprint = Tuple[object, ...]
+
+
+def skill_fingerprint(skill: Skill) -> Fingerprint:
+    """Return a canonical key of a skill, equal for skills rendered alike.
+
+    Fields are compared as normalized by the parser.
+    """
+    return (
+        skill.name.get_segments(),
+        skill.timing,
+        str(skill.judge),
+        str(skill.target),
+        str(skill.skill_range),
+        str(skill.cost),
+        skill.usage_limitation,
+        skill.effect,
+        None if skill.skill_class is None else str(skill.skill_class),
+        skill.level_above,
+        skill.level_now,
+        skill.critical,
+        skill.flavor,
+    )
+
+
+def fingerprint_digest(fingerprint: Fingerprint) -> str:
+    """Return a digest of a fingerprint, stable across processes."""
+    return hashlib.sha256(repr(fingerprint).encode('utf-8')).hexdigest()[:16]
+
+
+@dataclass
+class SkillOccurrences:
+    """Occurrences of a distinct skill."""
+
+    name: str
+    count: int = 0
+    sources: List[str] = field(default_factory=list)
+
+
+class SkillStore(SkillCache):
+    """Store keeping one canonical object of each distinct skill.
+
+    Each distinct line is parsed once, equal skills parsed from different
+    lines are replaced with the same object, and each distinct skill is
+    rendered once per mode. Lines missing in the store are looked up in
+    the backing cache if given.
+    """
+
+    def __init__(self, backing_cache: Optional[SkillCache] = None) -> None:
+        self._backing_cache = backing_cache
+        self._lines: Dict[Tuple[str, bool], Optional[Skill]] = {}
+        self._skills: Dict[Fingerprint, Skill] = {}
+        # Canonical skills are kept in _skills, so their ids are not reused
+        self._digests: Dict[int, str] = {}
+        self._cards: Dict[Tuple[str, bool, bool, bool, bool], str] = {}
+        self._occurrences: Dict[str, SkillOccurrences] = {}
+
+    def set_backing_cache(self, backing_cache: Optional[SkillCache]) -> None:
+        self._backing_cache = backing_cache
+
+    def canonical(self, skill: Skill) -> Skill:
+        """Return the canonical object of a skill."""
+        fingerprint = skill_fingerprint(skill)
+        canonical_skill = self._skills.get(fingerprint)
+        if canonical_skill is None:
+            canonical_skill = self._skills[fingerprint] = skill
+            self._digests[id(skill)] = fingerprint_digest(fingerprint)
+        return canonical_skill
+
+    def get(self, line: str, sl_as_limit: bool) -> Tuple[bool, Optional[Skill]]:
+        key = (line, sl_as_limit)
+        if key in self._lines:
+            return True, self._lines[key]
+        if self._backing_cache is None:
+            return False, None
+        found, skill = self._backing_cache.get(line, sl_as_limit)
+        if found:
+            if skill is not None:
+                skill = self.canonical(skill)
+            self._lines[key] = skill
+        return found, skill
+
+    def put(self, line: str, sl_as_limit: bool, skill: Optional[Skill]) -> None:
+        if self._backing_cache is not None:
+            self._backing_cache.put(line, sl_as_limit, skill)
+        if skill is not None:
+            skill = self.canonical(skill)
+        self._lines[(line, sl_as_limit)] = skill
+
+    def digest(self, skill: Skill) -> str:
+        """Return the fingerprint digest of a canonical skill."""
+        return self._digests[id(skill)]
+
+    def collect(self, skills: Iterable[Skill], source: str) -> Iterator[Skill]:
+        """Yield the canonical objects of skills from a source, recording
+        their occurrences.
+        """
+        for skill in skills:
+            skill = self.canonical(skill)
+            digest = self.digest(skill)
+            occurrences = self._occurrences.get(digest)
+            if occurrences is None:
+                occurrences = self._occurrences[digest] = SkillOccurrences(
+                    str(skill.name))
+            occurrences.count += 1
+            if not occurrences.sources or occurrences.sources[-1] != source:
+                occurrences.sources.append(source)
+            yield skill
+
+    def take_occurrences(self) -> Dict[str, SkillOccurrences]:
+        """Return the occurrences recorded so far and forget them."""
+        occurrences = self._occurrences
+        self._occurrences = {}
+        return occurrences
+
+    def render_page(
+        self,
+        skills: Sequence[Skill],
+        is_sleeve_mode: bool,
+        large: bool,
+        use_template: bool = False,
+        render: Callable[[Skill, bool, bool, bool, bool], str] = render_card,
+        compact: bool = False
+    ) -> str:
+        """Render a cards-container of canonical skills, reusing their cards.
+
+        Cards not rendered yet are rendered by render.
+        """
+        cards = []
+        for skill in skills:
+            key = (self.digest(skill), is_sleeve_mode, large, use_template,
+                   compact)
+            card = self._cards.get(key)
+            if card is None:
+                card = self._cards[key] = render(
+                    skill, is_sleeve_mode, large, use_template, compact)
+            cards.append(card)
+        return join_cards(cards, compact)
+
+
+def merge_occurrences(
+    occurrences_list: Iterable[Dict[str, SkillOccurrences]]
+) -> Dict[str, SkillOccurrences]:
+    merged: Dict[str, SkillOccurrences] = {}
+    for occurrences in occurrences_list:
+        for digest, occurrence in occurrences.items():
+            total = merged.setdefault(digest, SkillOccurrences(occurrence.name))
+            total.count += occurrence.count
+            total.sources += [source for source in occurrence.sources
+                              if source not in total.sources]
+    return merged
+
+
+def write_duplicates_report(
+    occurrences: Dict[str, SkillOccurrences],
+    path: Path
+) -> None:
+    """Write skills appearing more than once as json, most frequent first."""
+    duplicates = sorted(
+        ((digest, occurrence) for digest, occurrence in occurrences.items()
+         if occurrence.count > 1),
+        key=lambda item: (-item[1].count, item[1].name, item[0]))
+    report = {
+        'total': sum(occurrence.count for occurrence in occurrences.values()),
+        'unique': len(occurrences),
+        'duplicates': [
+            {
+                'fingerprint': digest,
+                'name': occurrence.name,
+                'count': occurrence.count,
+                'sources': sorted(occurrence.sources),
+            }
+            for digest, occurrence in duplicates
+        ],
+    }
+    with path.open('w', encoding='utf-8') as f:
+        f.write(json.dumps(report, indent=2, ensure_ascii=False) + '\n')
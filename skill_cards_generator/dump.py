@@ -0,0 +1,188 @@
+import mmap
+import os
+from array import array
+from pathlib import Path
+from sys import stderr
+from typing import Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+from .skill import Skill
+from .skill_crawler import iter_skills
+from .html_generator import open_html, write_html
+from .fragment_cache import FragmentCache
+from .parse_cache import SkillCache, ParseCache, default_max_entries
+
+
+# The same markers as skill_area_begin_regex and skill_area_end_regex
+section_begin = '■スキル■'.encode('utf-8')
+section_end = '■コネクション■'.encode('utf-8')
+# Markers are found as lines beginning with this
+marker_line_head = b'\n' + '■'.encode('utf-8')
+
+# Size of the part of the file mapped at once, a multiple of the granularity
+scan_window = 64 * 1024 * 1024
+scan_overlap = len(marker_line_head) + max(len(section_begin), len(section_end))
+
+
+def _marker_at(
+    data: Union[bytes, mmap.mmap],
+    position: int,
+    is_last: bool
+) -> Optional[bytes]:
+    """Return the marker filling the line at position of data if any."""
+    for marker in (section_begin, section_end):
+        line_end = position + len(marker)
+        if data[position:line_end] == marker and (
+                data[line_end:line_end + 1] == b'\n'
+                or (line_end == len(data) and is_last)):
+            return marker
+    return None
+
+
+class SheetDump:
+    """Many charasheets concatenated into a file, scanned through mmap.
+
+    Each skill section, from a skill marker to the next connection or skill
+    marker, is a deck. Sections are indexed by their byte offsets in one
+    scan, mapping a window of the file at a time, and only the section
+    being parsed is read, so memory does not grow with the size of the file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file = path.open('rb')
+        self._size = os.fstat(self._file.fileno()).st_size
+        # Offsets of the beginning and the end of each section
+        self._begins: Optional[array] = None
+        self._ends = array('q')
+
+    def _index(self) -> array:
+        if self._begins is None:
+            self._begins = array('q')
+            self._scan()
+        return self._begins
+
+    def section_offsets(self, index: int) -> Tuple[int, int]:
+        """Return the byte offsets of the beginning and the end of a section."""
+        return self._index()[index], self._ends[index]
+
+    def _iter_markers(self) -> Iterator[Tuple[int, bytes]]:
+        """Yield the offsets and the markers of marker lines in order."""
+        self._file.seek(0)
+        head = self._file.read(scan_overlap)
+        marker = _marker_at(head, 0, len(head) == self._size)
+        if marker is not None:
+            yield 0, marker
+        offset = 0
+        while offset < self._size:
+            length = min(scan_window + scan_overlap, self._size - offset)
+            is_last = offset + length == self._size
+            with mmap.mmap(self._file.fileno(), length,
+                           access=mmap.ACCESS_READ, offset=offset) as window:
+                position = window.find(marker_line_head)
+                while 0 <= position < scan_window:
+                    marker = _marker_at(window, position + 1, is_last)
+                    if marker is not None:
+                        yield offset + position + 1, marker
+                    position = window.find(marker_line_head, position + 1)
+            offset += scan_window
+
+    def _scan(self) -> None:
+        assert self._begins is not None
+        begin = None
+        for position, marker in self._iter_markers():
+            if begin is not None:
+                # Connection markers are kept to end the area in parsing
+                end = position + len(marker) if marker == section_end \
+                    else position
+                self._begins.append(begin)
+                self._ends.append(end)
+                begin = None
+            if marker == section_begin:
+                begin = position
+        if begin is not None:
+            self._begins.append(begin)
+            self._ends.append(self._size)
+
+    def __len__(self) -> int:
+        return len(self._index())
+
+    def section_text(self, index: int) -> str:
+        begin, end = self.section_offsets(index)
+        self._file.seek(begin)
+        return self._file.read(end - begin).decode('utf-8', errors='replace')
+
+    def iter_skills(
+        self,
+        index: int,
+        sl_as_limit: bool,
+        cache: Optional[SkillCache] = None
+    ) -> Iterator[Skill]:
+        """Yield skills of a section, parsed only when this is called."""
+        return iter_skills(self.section_text(index).split('\n'),
+                           sl_as_limit, cache)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> 'SheetDump':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def missing_sections(dump: SheetDump, indices: Iterable[int]) -> List[int]:
+    """Return the indices of sections which are not in the dump."""
+    return [index for index in indices if not 0 <= index < len(dump)]
+
+
+def render_dump(
+    dump: SheetDump,
+    output_dir: Path,
+    is_sleeve_mode: bool,
+    large: bool,
+    sl_as_limit: bool,
+    use_template: bool = False,
+    indices: Sequence[int] = (),
+    cache_path: Optional[Path] = None,
+    cache_size: int = default_max_entries,
+    report: TextIO = stderr,
+    compact: bool = False,
+    compress: bool = False,
+    fragment_cache_path: Optional[Path] = None
+) -> int:
+    """Render each section of a dump (or given ones) into a html file.
+
+    All indices are checked before anything is written, raising IndexError
+    if any of them is missing. With compress, html files are gzipped into
+    *.html.gz. Cards are cached in fragment_cache_path if it is given.
+    Return the number of rendered sections.
+    """
+    missing = missing_sections(dump, indices)
+    if missing:
+        raise IndexError(f'no section {missing[0]} in {dump.path}')
+    output_dir.mkdir(parents=True, exist_ok=True)
+    suffix = '.html.gz' if compress else '.html'
+    cache = None
+    fragment_cache = None
+    try:
+        if cache_path is not None:
+            cache = ParseCache(cache_path, cache_size)
+        writer = write_html
+        if fragment_cache_path is not None:
+            fragment_cache = FragmentCache(fragment_cache_path)
+            writer = fragment_cache.write_html
+        print(f'{len(dump)} sections in {dump.path}', file=report)
+        indices = indices or range(len(dump))
+        for index in indices:
+            output_path = output_dir / f'{dump.path.stem}-{index:04d}{suffix}'
+            with open_html(output_path, compress) as output_file:
+                writer(dump.iter_skills(index, sl_as_limit, cache),
+                       output_file, is_sleeve_mode, large, use_template,
+                       compact)
+            print(f'ok: section {index} -> {output_path}', file=report)
+        return len(indices)
+    finally:
+        if cache is not None:
+            cache.close()
+        if fragment_cache is not None:
+            fragment_cache.close()
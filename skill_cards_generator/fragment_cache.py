@@ -0,0 +1,144 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional, Sequence, TextIO
+from .skill import Skill
+from .html_generator import join_cards, render_card, split_pages, write_pages
+from .dedup import fingerprint_digest, skill_fingerprint
+from .sqlite_store import SqliteStore, default_max_entries
+
+
+default_max_memory_entries = 4096
+
+
+def template_version() -> str:
+    """Fingerprint of the rendering, changed whenever cards may change.
+
+    Cards depend on the text of parsed fields as well as on the templates,
+    so the whole package is fingerprinted as by parser_version, with the
+    version of yattag which renders what templates do not.
+    """
+    import hashlib
+    import yattag
+    from .parse_cache import parser_version
+    return hashlib.sha256(
+        f'{parser_version()}:{yattag.__version__}'.encode('utf-8')).hexdigest()
+
+
+class FragmentCache:
+    """Cache of rendered cards keyed by the content and the render mode.
+
+    Cards are kept in an in-memory LRU, backed by a SqliteStore if path is
+    given, whose entries are all dropped when the rendering changes.
+    Templates and yattag give the same markup, so cards are shared between
+    them.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_entries: int = default_max_entries,
+        max_memory_entries: int = default_max_memory_entries
+    ) -> None:
+        self._max_memory_entries = max_memory_entries
+        self._memory: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._store: Optional[SqliteStore] = None
+        if path is not None:
+            self._store = SqliteStore(path, 'cards', template_version,
+                                      max_entries)
+
+    @staticmethod
+    def _key(skill: Skill, is_sleeve_mode: bool, large: bool, compact: bool) -> str:
+        return fingerprint_digest(
+            (skill_fingerprint(skill), is_sleeve_mode, large, compact))
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            card = self._memory.get(key)
+            if card is not None:
+                self._memory.move_to_end(key)
+        if self._store is None:
+            return card
+        if card is not None:
+            self._store.touch(key)
+            return card
+        card = self._store.get(key)
+        if card is not None:
+            with self._lock:
+                self._remember(key, card)
+        return card
+
+    def _remember(self, key: str, card: str) -> None:
+        self._memory[key] = card
+        if len(self._memory) > self._max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _put(self, key: str, card: str) -> None:
+        with self._lock:
+            self._remember(key, card)
+        if self._store is not None:
+            self._store.put(key, card)
+
+    def render_card(
+        self,
+        skill: Skill,
+        is_sleeve_mode: bool,
+        large: bool,
+        use_template: bool = False,
+        compact: bool = False
+    ) -> str:
+        """Render a card of a skill, reusing the cached one if any."""
+        key = self._key(skill, is_sleeve_mode, large, compact)
+        card = self._get(key)
+        if card is None:
+            card = render_card(skill, is_sleeve_mode, large, use_template,
+                               compact)
+            self._put(key, card)
+        return card
+
+    def render_page(
+        self,
+        skills: Sequence[Skill],
+        is_sleeve_mode: bool,
+        large: bool,
+        use_template: bool = False,
+        compact: bool = False
+    ) -> str:
+        """Render a cards-container of given skills, reusing cached cards."""
+        return join_cards(
+            (self.render_card(skill, is_sleeve_mode, large, use_template,
+                              compact)
+             for skill in skills), compact)
+
+    def write_html(
+        self,
+        skills: Iterable[Skill],
+        stream: TextIO,
+        is_sleeve_mode: bool,
+        large: bool,
+        use_template: bool = False,
+        compact: bool = False,
+        stylesheet: Optional[str] = None
+    ) -> None:
+        """Write html file as html_generator.write_html, reusing cached cards."""
+        pages = (self.render_page(page_skills, is_sleeve_mode, large,
+                                  use_template, compact)
+                 for page_skills in split_pages(skills))
+        write_pages(pages, stream, is_sleeve_mode, use_template, stylesheet,
+                    compact)
+
+    def flush(self) -> None:
+        if self._store is not None:
+            self._store.flush()
+
+    def close(self) -> None:
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    def __enter__(self) -> 'FragmentCache':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -1,17 +1,42 @@
 from .skill import Skill
 from .skill_range import SkillRange, SkillRangeKind
-from typing import Sequence
-from yattag import Doc, indent
+from .layout import title_font_sizes, effect_font_size
+from .zenhan import zen_number
+from .card_template import (
+    generate_linked_skeleton_from_template, generate_page_from_template,
+    generate_skeleton_from_template)
+from .card_template import render_card as render_card_from_template
+from typing import BinaryIO, Sequence, Iterable, Iterator, List, Optional, Tuple, TextIO
+from functools import lru_cache
+import re
 from pathlib import Path
-import mojimoji
+from io import StringIO
+from itertools import islice
 
+# yattag is imported only when rendering with it, since the template
+# backend does not need it at all.
 
 num_in_a_page = 9
+empty_body = '<body></body>'
+body_indentation = '  '
+page_indentation = body_indentation * 2
+cards_container_open = '<div class="cards-container">\n'
+cards_container_close = '</div>'
+compact_cards_container_open = '<div class="cards-container">'
+# Name of the stylesheet written beside html files linking it
+stylesheet_name = 'cards.css'
+gzip_level = 6
 
+# Comments and whitespace of css, and strings where they are kept
+css_gap = r'(?:\s|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/)'
+css_gap_regex = re.compile(
+    r'("(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\')'
+    + r'|' + css_gap + r'*([{};,])' + css_gap + r'*'
+    + r'|(:)' + css_gap + r'+|' + css_gap + r'+')
 
-def generate_html(skills: Sequence[Skill], is_sleeve_mode: bool, large: bool) -> str:
-    """Generate html file from given skills."""
 
+@lru_cache(maxsize=None)
+def load_css(is_sleeve_mode: bool) -> str:
     root_path = (Path(__file__) / '../../css/').resolve()
     common_css_path = root_path / 'common.css'
     additional_css_path = root_path / 'skill_book.css'
@@ -21,7 +46,63 @@ def generate_html(skills: Sequence[Skill], is_sleeve_mode: bool, large: bool) ->
     for path in [common_css_path, additional_css_path]:
         with path.open('r') as f:
             css += f.read() + '\n'
+    return css
+
+
+def _css_gap(match: 're.Match[str]') -> str:
+    # Any other gap separates tokens, such as selectors of descendants
+    return next((group for group in match.groups() if group is not None), ' ')
+
+
+def minify_css(css: str) -> str:
+    """Drop comments and whitespace of css, except in strings."""
+    return css_gap_regex.sub(_css_gap, css).replace(';}', '}').strip()
+
+
+@lru_cache(maxsize=None)
+def load_minified_css(is_sleeve_mode: bool) -> str:
+    return minify_css(load_css(is_sleeve_mode))
+
+
+def write_stylesheet(output_dir: Path, is_sleeve_mode: bool, compact: bool = False) -> str:
+    """Write the css into output_dir, returning the name to link it."""
+    css = load_minified_css(is_sleeve_mode) if compact else load_css(is_sleeve_mode)
+    (output_dir / stylesheet_name).write_text(css, encoding='utf-8')
+    return stylesheet_name
+
+
+def open_html(path: Path, compress: bool = False) -> TextIO:
+    """Open a html file to write, which is gzipped if compress is set."""
+    if compress:
+        import gzip
+        return gzip.open(str(path), 'wt', encoding='utf-8',
+                         compresslevel=gzip_level)
+    return path.open('w', encoding='utf-8')
 
+
+def gzip_stream(stream: BinaryIO) -> TextIO:
+    """Wrap a binary stream such as stdout to write gzipped html into it.
+
+    Closing the result finishes the gzip stream but leaves stream open.
+    """
+    import gzip
+    return gzip.open(stream, 'wt', encoding='utf-8', compresslevel=gzip_level)
+
+
+@lru_cache(maxsize=None)
+def generate_skeleton(css: str) -> Tuple[str, str]:
+    """Generate the indented html before and after the contents of body."""
+    return _generate_skeleton(css, None)
+
+
+@lru_cache(maxsize=None)
+def generate_linked_skeleton(href: str) -> Tuple[str, str]:
+    """Generate the skeleton linking a stylesheet instead of inlining css."""
+    return _generate_skeleton(None, href)
+
+
+def _generate_skeleton(css: Optional[str], href: Optional[str]) -> Tuple[str, str]:
+    from yattag import Doc, indent
     doc, tag, text, line = Doc().ttl()
     stag = doc.stag
     doc.asis('<!DOCTYPE html>')
@@ -31,71 +112,222 @@ def generate_html(skills: Sequence[Skill], is_sleeve_mode: bool, large: bool) ->
             line('title', 'Arianrhod Skill Cards')
             stag('meta', name='viewport',
                  content='width=device-width, initial-scale=1')
-            with tag('style', type='text/css'):
-                text(css)
-        with tag('body'):
-            for skill_id in range(0, len(skills), num_in_a_page):
-                with tag('div', klass='cards-container'):
-                    for skill in skills[skill_id:skill_id+num_in_a_page]:
-                        with tag('div', klass='card-outline-box'):
-                            with tag('div', klass='card-title-box'):
-                                # Name with auto-smallening
-                                if skill.skill_class is not None:
-                                    class_name_len = len(
-                                        str(skill.skill_class))
-                                else:
-                                    class_name_len = 0
-                                skill_name_len = len(skill.name.get_base())
-                                maximum_width = 80
-                                if is_sleeve_mode:
-                                    maximum_width = 70
-                                if large:
-                                    maximum_width = int(
-                                        maximum_width * 1.1)
-                                # Smallen skill name
-                                class_size = 5.2
-                                skill_size = 7.2
-                                now_width = class_size * class_name_len + skill_size * skill_name_len
-                                coefficient = min(maximum_width / now_width, 1.0)
-                                class_size *= coefficient
-                                skill_size *= coefficient
-                                if skill.skill_class is not None:
-                                    line('h3', str(skill.skill_class),
-                                         klass='skill-class', style=f'font-size: {class_size}mm;')
-                                with tag('h2', klass='skill-name'):
-                                    doc.attr(style=f'font-size: {skill_size}mm;')
-                                    doc.asis(skill.name.as_html())
-                            line('div', '', klass='card-border')
-                            with tag('div', klass='card-main-box'):
-                                line('p', skill.timing, klass='timing')
-                                with tag('div', klass='inner-horizontal-box'):
-                                    line('p', str(skill.judge), klass='judge')
-                                    line('p', str(skill.target), klass='target')
-                                with tag('div', klass='inner-horizontal-box'):
-                                    line('p', str(skill.skill_range),
-                                         klass='effect-range')
-                                    line('p', str(skill.cost),
-                                         klass='skill-cost')
-                                if skill.level_now is not None:
-                                    line('p', mojimoji.han_to_zen(str(skill.level_now)),
-                                         klass='skill-level-now')
-                                if skill.level_above is not None:
-                                    line('p', mojimoji.han_to_zen(str(skill.level_above)),
-                                         klass='skill-level-bound')
-                                if skill.usage_limitation is not None:
-                                    line('p', skill.usage_limitation,
-                                         klass='limitation')
-                                else:
-                                    line('p', 'ー',
-                                         klass='limitation')
-                                line('p', skill.effect, klass='effect')
-                                if skill.critical is not None:
-                                    line('p', skill.critical, klass='critical')
-                                if skill.flavor is not None:
-                                    line('p', skill.flavor, klass='flavor')
+            if href is not None:
+                stag('link', rel='stylesheet', href=href)
+            else:
+                with tag('style', type='text/css'):
+                    text(css)
+        line('body', '')
+    before, after = indent(doc.getvalue()).rsplit(empty_body, 1)
+    return before, after
+
+
+def generate_page(
+    skills: Sequence[Skill],
+    is_sleeve_mode: bool,
+    large: bool,
+    compact: bool = False
+) -> str:
+    """Generate an indented (or compact) cards-container of given skills."""
+    from yattag import Doc, indent
+
+    doc, tag, text, line = Doc().ttl()
+    with tag('div', klass='cards-container'):
+        for skill in skills:
+            with tag('div', klass='card-outline-box'):
+                with tag('div', klass='card-title-box'):
+                    class_size, skill_size = title_font_sizes(
+                        skill, is_sleeve_mode, large)
+                    if skill.skill_class is not None:
+                        line('h3', str(skill.skill_class),
+                             klass='skill-class', style=f'font-size: {class_size}mm;')
+                    with tag('h2', klass='skill-name'):
+                        doc.attr(style=f'font-size: {skill_size}mm;')
+                        doc.asis(skill.name.as_html())
+                line('div', '', klass='card-border')
+                with tag('div', klass='card-main-box'):
+                    line('p', skill.timing, klass='timing')
+                    with tag('div', klass='inner-horizontal-box'):
+                        line('p', str(skill.judge), klass='judge')
+                        line('p', str(skill.target), klass='target')
+                    with tag('div', klass='inner-horizontal-box'):
+                        line('p', str(skill.skill_range),
+                             klass='effect-range')
+                        line('p', str(skill.cost),
+                             klass='skill-cost')
+                    if skill.level_now is not None:
+                        line('p', zen_number(skill.level_now),
+                             klass='skill-level-now')
+                    if skill.level_above is not None:
+                        line('p', zen_number(skill.level_above),
+                             klass='skill-level-bound')
+                    if skill.usage_limitation is not None:
+                        line('p', skill.usage_limitation,
+                             klass='limitation')
+                    else:
+                        line('p', 'ー',
+                             klass='limitation')
+                    effect_size = effect_font_size(skill, is_sleeve_mode)
+                    effect_attrs = {}
+                    if effect_size is not None:
+                        effect_attrs['style'] = f'font-size: {effect_size}mm;'
+                    line('p', skill.effect, klass='effect', **effect_attrs)
+                    if skill.critical is not None:
+                        line('p', skill.critical, klass='critical', **effect_attrs)
+                    if skill.flavor is not None:
+                        line('p', skill.flavor, klass='flavor', **effect_attrs)
+    if compact:
+        return doc.getvalue()
     return indent(doc.getvalue())
 
 
+def render_page(
+    skills: Sequence[Skill],
+    is_sleeve_mode: bool,
+    large: bool,
+    use_template: bool = False,
+    compact: bool = False
+) -> str:
+    """Render a cards-container of given skills.
+
+    If use_template is set, it is rendered from precompiled templates
+    instead of yattag where possible, with the same result. Compact pages
+    have no whitespace between tags, and are always rendered from templates
+    where possible.
+    """
+    page = None
+    if use_template or compact:
+        page = generate_page_from_template(skills, is_sleeve_mode, large, compact)
+    if page is None:
+        page = generate_page(skills, is_sleeve_mode, large, compact)
+    return page
+
+
+def render_card(
+    skill: Skill,
+    is_sleeve_mode: bool,
+    large: bool,
+    use_template: bool = False,
+    compact: bool = False
+) -> str:
+    """Render a card of a skill, indented as in a cards-container."""
+    card = None
+    if use_template or compact:
+        card = render_card_from_template(skill, is_sleeve_mode, large, compact)
+    if card is None:
+        page = generate_page([skill], is_sleeve_mode, large, compact)
+        container_open = compact_cards_container_open if compact \
+            else cards_container_open
+        card = page[len(container_open):-len(cards_container_close)]
+    return card
+
+
+def join_cards(cards: Iterable[str], compact: bool = False) -> str:
+    """Put rendered cards into a cards-container, as render_page does."""
+    container_open = compact_cards_container_open if compact \
+        else cards_container_open
+    return container_open + ''.join(cards) + cards_container_close
+
+
+def split_pages(skills: Iterable[Skill]) -> Iterator[List[Skill]]:
+    """Split skills into the ones of each page."""
+    skill_iter = iter(skills)
+    while True:
+        page_skills = list(islice(skill_iter, num_in_a_page))
+        if not page_skills:
+            return
+        yield page_skills
+
+
+def write_pages(
+    pages: Iterable[str],
+    stream: TextIO,
+    is_sleeve_mode: bool,
+    use_template: bool = False,
+    stylesheet: Optional[str] = None,
+    compact: bool = False
+) -> None:
+    """Write html file from rendered pages one by one.
+
+    If stylesheet is given, the file links it instead of inlining css.
+    If compact is set, pages are written as they are, without whitespace
+    between them, and inlined css is minified.
+    """
+
+    if compact:
+        if stylesheet is not None:
+            before_body, after_body = \
+                generate_linked_skeleton_from_template(stylesheet, True)
+        else:
+            before_body, after_body = generate_skeleton_from_template(
+                load_minified_css(is_sleeve_mode), True)
+        stream.write(before_body + '<body>')
+        for page in pages:
+            stream.write(page)
+        stream.write('</body>' + after_body + '\n')
+        return
+    if stylesheet is not None:
+        if use_template:
+            before_body, after_body = \
+                generate_linked_skeleton_from_template(stylesheet)
+        else:
+            before_body, after_body = generate_linked_skeleton(stylesheet)
+    else:
+        css = load_css(is_sleeve_mode)
+        if use_template:
+            before_body, after_body = generate_skeleton_from_template(css)
+        else:
+            before_body, after_body = generate_skeleton(css)
+    stream.write(before_body)
+    is_empty = True
+    for page in pages:
+        if is_empty:
+            stream.write('<body>\n')
+            is_empty = False
+        stream.write(page_indentation
+                     + page.replace('\n', '\n' + page_indentation) + '\n')
+    if is_empty:
+        stream.write(empty_body)
+    else:
+        stream.write(body_indentation + '</body>')
+    stream.write(after_body + '\n')
+
+
+def write_html(
+    skills: Iterable[Skill],
+    stream: TextIO,
+    is_sleeve_mode: bool,
+    large: bool,
+    use_template: bool = False,
+    compact: bool = False,
+    stylesheet: Optional[str] = None
+) -> None:
+    """Write html file from given skills page by page.
+
+    Each cards-container is written as soon as its skills are given,
+    so the whole document is never held in memory.
+    """
+
+    pages = (render_page(page_skills, is_sleeve_mode, large, use_template,
+                         compact)
+             for page_skills in split_pages(skills))
+    write_pages(pages, stream, is_sleeve_mode, use_template, stylesheet,
+                compact)
+
+
+def generate_html(
+    skills: Sequence[Skill],
+    is_sleeve_mode: bool,
+    large: bool,
+    use_template: bool = False
+) -> str:
+    """Generate html file from given skills."""
+
+    stream = StringIO()
+    write_html(skills, stream, is_sleeve_mode, large, use_template)
+    return stream.getvalue().rstrip('\n')
+
+
 def main() -> None:
     skills = [
         Skill(
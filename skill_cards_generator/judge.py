@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import enum
-import mojimoji
 import re
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 from .ability import Ability
+from .normalized_check import compile_table, normalize_and_check
+from .value_object import ValueObject
 
 
 class JudgeKind(enum.Enum):
@@ -18,37 +19,52 @@ class JudgeKind(enum.Enum):
     string = enum.auto()
 
 
-unify_judge_table = [
-    [JudgeKind.nothing, ('-', '')],
-    [JudgeKind.auto_success, ('自', '成', '自動', '成功',
-                              '自動成功', 'success', 'suc', 'sc', 's')],
-    [JudgeKind.hit, ('命', '命中', 'hit', 'ht', 'h')],
-    [JudgeKind.spell, ('魔', '魔術', 'spell', 'spl', 'sp',
-                       'magic', 'mag', 'mg', 'm')],
-    [JudgeKind.song, ('呪', '歌', '呪歌', 'song', 'sg')],
-    [JudgeKind.alchemy, ('錬', '錬金', '錬金術', 'alchemy',
-                         'alc', 'ac', 'acm', 'a')],
+unify_judge_table: List[Tuple[JudgeKind, Tuple[str, ...]]] = [
+    (JudgeKind.nothing, ('-', '')),
+    (JudgeKind.auto_success, ('自', '成', '自動', '成功',
+                              '自動成功', 'success', 'suc', 'sc', 's')),
+    (JudgeKind.hit, ('命', '命中', 'hit', 'ht', 'h')),
+    (JudgeKind.spell, ('魔', '魔術', 'spell', 'spl', 'sp',
+                       'magic', 'mag', 'mg', 'm')),
+    (JudgeKind.song, ('呪', '歌', '呪歌', 'song', 'sg')),
+    (JudgeKind.alchemy, ('錬', '錬金', '錬金術', 'alchemy',
+                         'alc', 'ac', 'acm', 'a')),
 ]
+unify_judge_index = compile_table(unify_judge_table)
 judge_border_regex = re.compile(
     r'(.+?)[\s(（\[]?(難)?(難易度)?([0-9０１２３４５６７８９]+)[)）\]\s]?')
 
 
-class Judge:
+class Judge(ValueObject):
+    __slots__ = ('_judge_kind', '_ability', '_string')
+    _judge_kind: JudgeKind
+    _ability: Optional[Ability]
+    _string: Optional[str]
+
     def __init__(
         self,
         judge_kind: JudgeKind,
-        ability: Ability = None,
-        string: str = None
+        ability: Optional[Ability] = None,
+        string: Optional[str] = None
     ) -> None:
-        self._judge_kind = judge_kind
         if judge_kind is JudgeKind.ability:
             assert ability is not None
-            self._ability = ability
+        else:
+            ability = None
         if judge_kind is JudgeKind.string:
             assert string is not None
-            self._string = string
+        else:
+            string = None
+        self._assign(_judge_kind=judge_kind, _ability=ability, _string=string)
+
+    @property
+    def kind(self) -> JudgeKind:
+        return self._judge_kind
+
+    def _args(self) -> Tuple[JudgeKind, Optional[Ability], Optional[str]]:
+        return self._judge_kind, self._ability, self._string
 
-    def to_str(self, is_for_effect: bool):
+    def to_str(self, is_for_effect: bool) -> str:
         if self._judge_kind is JudgeKind.nothing:
             if is_for_effect:
                 return '判定'
@@ -70,10 +86,10 @@ class Judge:
                 return f'【{str(self._ability)}】判定'
             return str(self._ability)
         else:
-            assert self._judge_kind is JudgeKind.string
+            assert self._judge_kind is JudgeKind.string and self._string is not None
             return self._string
 
-    def __str__(self):
+    def _to_str(self) -> str:
         return self.to_str(False)
 
     @staticmethod
@@ -86,12 +102,10 @@ class Judge:
             difficulty = int(match.group(4))
         if len(text) >= 2 and text[-2:] == '判定':
             text = text[:-2]
-        for kind, candidates in unify_judge_table:
-            for candidate in candidates:
-                if (mojimoji.zen_to_han(text).lower()
-                        == mojimoji.zen_to_han(candidate).lower()):
-                    return Judge(kind), difficulty
+        kind = normalize_and_check(text, unify_judge_index)
+        if kind is not None:
+            return Judge.interned(kind), difficulty
         ability = Ability.from_text(text)
         if ability is not None:
-            return Judge(JudgeKind.ability, ability), difficulty
-        return Judge(JudgeKind.string, string=original), None
+            return Judge.interned(JudgeKind.ability, ability), difficulty
+        return Judge.interned(JudgeKind.string, None, original), None
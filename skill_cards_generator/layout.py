@@ -0,0 +1,198 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+import math
+import unicodedata
+from .skill import Skill
+
+
+# Widths of glyphs in em. Kana and kanji are full width, while ascii,
+# half-width kana and punctuation narrowed by "palt" are about half.
+half_width = 0.5
+full_width = 1.0
+narrow_punctuation = '、。，．・：；「」『』（）［］｛｝〔〕【】〈〉《》'
+
+
+def _measure_glyph(char: str) -> float:
+    if unicodedata.combining(char) or unicodedata.category(char) == 'Cf':
+        return 0.0
+    if char in narrow_punctuation:
+        return half_width
+    if unicodedata.east_asian_width(char) in ('F', 'W', 'A'):
+        return full_width
+    return half_width
+
+
+def _build_glyph_widths() -> Dict[str, float]:
+    code_ranges = [
+        (0x0020, 0x007f),  # ascii
+        (0x3000, 0x3100),  # cjk symbols and punctuation, kana
+        (0xff01, 0xffa0),  # full-width forms and half-width kana
+    ]
+    return {chr(code): _measure_glyph(chr(code))
+            for start, end in code_ranges for code in range(start, end)}
+
+
+glyph_widths = _build_glyph_widths()
+
+
+def glyph_width(char: str) -> float:
+    """Return the width of a glyph in em."""
+    width = glyph_widths.get(char)
+    if width is None:
+        width = _measure_glyph(char)
+    return width
+
+
+@lru_cache(maxsize=4096)
+def text_width(text: str) -> float:
+    """Estimate the width of a text in em."""
+    return sum(glyph_width(char) for char in text)
+
+
+def ruby_text_width(segments: Sequence[Tuple[str, Optional[str]]]) -> float:
+    """Estimate the width of a text with rubys in em.
+
+    Rubys are half as large as the base, so they widen it only if longer.
+    """
+    return sum(text_width(base) if ruby is None
+               else max(text_width(base), text_width(ruby) / 2)
+               for base, ruby in segments)
+
+
+@dataclass(frozen=True)
+class CardBox:
+    """Sizes (mm) of the boxes in a card."""
+
+    title_width: float
+    main_width: float
+    main_height: float
+    font_size: float
+
+
+# Main boxes are measured from css, less paddings and borders.
+book_card_box = CardBox(80, 82.8, 108.9, 4.6)
+sleeve_card_box = CardBox(70, 76.0, 105.5, 4.5)
+
+class_font_size = 5.2
+skill_font_size = 7.2
+large_title_scale = 1.1
+
+line_height = 1.2
+letter_spacing = -0.1
+paragraph_spacing = 0.4
+minimum_effect_font_size = 3.0
+effect_font_size_step = 0.1
+
+# Widths (em) of the labels put before paragraphs by css
+label_widths = {
+    'timing': 6,
+    'judge': 3,
+    'target': 3,
+    'effect-range': 3,
+    'skill-cost': 4,
+    'skill-level-now': 3,
+    'skill-level-bound': 5,
+    'limitation': 5,
+    'effect': 3,
+    'critical': 7,
+    'flavor': 1,
+}
+
+# A row of paragraphs side by side, as label widths and texts
+Row = Tuple[Tuple[int, str], ...]
+
+
+def card_box(is_sleeve_mode: bool) -> CardBox:
+    return sleeve_card_box if is_sleeve_mode else book_card_box
+
+
+def title_font_sizes(skill: Skill, is_sleeve_mode: bool, large: bool) -> Tuple[float, float]:
+    """Calculate font sizes (mm) of the class and the name of a skill."""
+    class_text = str(skill.skill_class) if skill.skill_class is not None else ''
+    return fit_title(class_text, skill.name.get_segments(), is_sleeve_mode, large)
+
+
+@lru_cache(maxsize=4096)
+def fit_title(
+    class_text: str,
+    name_segments: Tuple[Tuple[str, Optional[str]], ...],
+    is_sleeve_mode: bool,
+    large: bool
+) -> Tuple[float, float]:
+    """Calculate font sizes (mm) of a class and a name to fit the title box."""
+    maximum_width = card_box(is_sleeve_mode).title_width
+    if large:
+        maximum_width = int(maximum_width * large_title_scale)
+    # Smallen skill name
+    class_size = class_font_size
+    skill_size = skill_font_size
+    now_width = (class_size * text_width(class_text)
+                 + skill_size * ruby_text_width(name_segments))
+    if now_width == 0:
+        return class_size, skill_size
+    coefficient = min(maximum_width / now_width, 1.0)
+    class_size *= coefficient
+    skill_size *= coefficient
+    return class_size, skill_size
+
+
+def effect_font_size(skill: Skill, is_sleeve_mode: bool) -> Optional[float]:
+    """Calculate a font size (mm) of the effect, critical and flavor to fit
+    the card, or None if they fit in the default size.
+    """
+    rows = [
+        ((label_widths['timing'], skill.timing),),
+        ((label_widths['judge'], str(skill.judge)),
+         (label_widths['target'], str(skill.target))),
+        ((label_widths['effect-range'], str(skill.skill_range)),
+         (label_widths['skill-cost'], str(skill.cost))),
+    ]
+    if skill.level_now is not None:
+        rows.append(((label_widths['skill-level-now'], str(skill.level_now)),))
+    if skill.level_above is not None:
+        rows.append(((label_widths['skill-level-bound'], str(skill.level_above)),))
+    rows.append(((label_widths['limitation'], skill.usage_limitation or 'ー'),))
+    effect_rows = [((label_widths['effect'], skill.effect),)]
+    if skill.critical is not None:
+        effect_rows.append(((label_widths['critical'], skill.critical),))
+    if skill.flavor is not None:
+        effect_rows.append(((label_widths['flavor'], skill.flavor),))
+    return fit_main_box(tuple(rows), tuple(effect_rows), is_sleeve_mode)
+
+
+def _rows_height(rows: Tuple[Row, ...], font_size: float, width: float) -> float:
+    height = 0.0
+    for row in rows:
+        paragraph_width = width / len(row)
+        num_lines = 1
+        for label_width, text in row:
+            glyphs_width = (font_size * (label_width + text_width(text))
+                            + letter_spacing * (label_width + len(text)))
+            num_lines = max(num_lines, math.ceil(glyphs_width / paragraph_width))
+        height += num_lines * font_size * line_height + paragraph_spacing
+    return height
+
+
+@lru_cache(maxsize=4096)
+def fit_main_box(
+    rows: Tuple[Row, ...],
+    effect_rows: Tuple[Row, ...],
+    is_sleeve_mode: bool
+) -> Optional[float]:
+    """Calculate a font size (mm) of effect rows to fit the main box below
+    other rows, or None if they fit in the default size.
+
+    The size is not made smaller than minimum_effect_font_size.
+    """
+    box = card_box(is_sleeve_mode)
+    room = box.main_height - _rows_height(rows, box.font_size, box.main_width)
+    if _rows_height(effect_rows, box.font_size, box.main_width) <= room:
+        return None
+    steps = int(round((box.font_size - minimum_effect_font_size)
+                      / effect_font_size_step))
+    for step in range(1, steps + 1):
+        font_size = round(box.font_size - step * effect_font_size_step, 1)
+        if _rows_height(effect_rows, font_size, box.main_width) <= room:
+            return font_size
+    return minimum_effect_font_size
@@ -1,32 +1,47 @@
-from typing import List, Tuple, Set, TypeVar, Optional
-import mojimoji
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple, TypeVar, Optional
+from .zenhan import memo_size, zen_to_han
 
 
 T = TypeVar('T')
+AliasIndex = Dict[str, T]
+
+
+@lru_cache(maxsize=memo_size)
+def normalize(text: str) -> str:
+    return zen_to_han(text).lower()
 
 
 def normalize_and_compare(source: str, target: str) -> bool:
-    return (mojimoji.zen_to_han(source).lower()
-            == mojimoji.zen_to_han(target).lower())
+    return normalize(source) == normalize(target)
+
+
+def compile_table(table: Iterable[Tuple[T, Iterable[str]]]) -> AliasIndex[T]:
+    """Build a normalized alias -> key index from a unify table.
+
+    If an alias appears under several keys, the earliest key wins,
+    matching the order a linear scan over the table would check them.
+    """
+    index: AliasIndex[T] = {}
+    for key, candidates in table:
+        for candidate in candidates:
+            index.setdefault(normalize(candidate), key)
+    return index
 
 
 def normalize_and_check(
     target: str,
-    table: List[Tuple[T, Set[str]]],
+    index: AliasIndex[T],
 ) -> Optional[T]:
-    for key, candidates in table:
-        for candidate in candidates:
-            if normalize_and_compare(target, candidate):
-                return key
-    return None
+    return index.get(normalize(target))
 
 
 def normalize_and_check_with_default(
     target: str,
-    table: List[Tuple[T, Set[str]]],
+    index: AliasIndex[T],
     default: T
 ) -> T:
-    result = normalize_and_check(target, table)
+    result = normalize_and_check(target, index)
     if result is None:
         return default
     return result
@@ -0,0 +1,113 @@
+import re
+from html import escape
+from itertools import chain, islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+from .skill import Skill
+from . import html_generator
+from .html_generator import split_pages, write_stylesheet
+
+
+default_pages_per_file = 10
+index_name = 'index.html'
+
+index_template = (
+    '<!DOCTYPE html>\n'
+    '<html>\n'
+    '  <head>\n'
+    '    <meta charset="utf-8" />\n'
+    '    <title>Arianrhod Skill Cards</title>\n'
+    '    <meta name="viewport" content="width=device-width, initial-scale=1" />\n'
+    '  </head>\n'
+    '  <body>\n'
+    '    <ul>\n'
+    '{items}'
+    '    </ul>\n'
+    '  </body>\n'
+    '</html>\n'
+)
+index_item_template = \
+    '      <li><a href="{href}">{name}</a> (cards {first}-{last})</li>\n'
+
+PageRenderer = Callable[[Sequence[Skill], bool, bool, bool, bool], str]
+
+
+def write_index(output_dir: Path, files: Sequence[Tuple[str, int, int]]) -> None:
+    """Write the index page linking files with their first and last cards."""
+    items = ''.join(
+        index_item_template.format(href=escape(name), name=escape(name),
+                                   first=first, last=last)
+        for name, first, last in files)
+    with (output_dir / index_name).open('w', encoding='utf-8') as index_file:
+        index_file.write(index_template.format(items=items))
+
+
+def remove_stale_files(output_dir: Path, stem: str, paths: Sequence[Path]) -> None:
+    """Remove files of pages of stem which are not in paths, left by a
+    previous run with more pages.
+    """
+    name_regex = re.compile(re.escape(stem) + r'-\d{4,}\.html')
+    names = {path.name for path in paths}
+    for path in output_dir.glob(f'{stem}-*.html'):
+        if name_regex.fullmatch(path.name) and path.name not in names:
+            path.unlink()
+
+
+def write_paginated_html(
+    skills: Iterable[Skill],
+    output_dir: Path,
+    is_sleeve_mode: bool,
+    large: bool,
+    use_template: bool = False,
+    pages_per_file: int = default_pages_per_file,
+    stem: str = 'cards',
+    render: Optional[PageRenderer] = None,
+    compact: bool = False
+) -> List[Path]:
+    """Write pages of skills into html files of pages_per_file pages each.
+
+    The files link a stylesheet written beside them instead of inlining css,
+    and an index page links the files, so that each of them can be printed
+    alone. Pages are split as in write_html, and rendered by render
+    (html_generator.render_page by default) as they are written. Files of
+    pages left by a previous run with more pages are removed. Return the
+    paths of the written files of pages.
+
+    If compact is set, the files and the stylesheet have no whitespace to
+    be laid out.
+    """
+    if pages_per_file < 1:
+        raise ValueError('pages_per_file must be positive')
+    # Functions are looked up now, so that they can be replaced as in profiling
+    render_pages = render or html_generator.render_page
+    write_pages = html_generator.write_pages
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stylesheet = write_stylesheet(output_dir, is_sleeve_mode, compact)
+
+    num_cards = 0
+
+    def pages() -> Iterator[str]:
+        nonlocal num_cards
+        for page_skills in split_pages(skills):
+            num_cards += len(page_skills)
+            yield render_pages(page_skills, is_sleeve_mode, large, use_template,
+                         compact)
+
+    page_iter = pages()
+    paths: List[Path] = []
+    files: List[Tuple[str, int, int]] = []
+    while True:
+        first_card = num_cards + 1
+        first_page = next(page_iter, None)
+        if first_page is None:
+            break
+        path = output_dir / f'{stem}-{len(paths) + 1:04d}.html'
+        with path.open('w', encoding='utf-8') as output_file:
+            write_pages(chain([first_page], islice(page_iter, pages_per_file - 1)),
+                        output_file, is_sleeve_mode, use_template,
+                        stylesheet, compact)
+        paths.append(path)
+        files.append((path.name, first_card, num_cards))
+    write_index(output_dir, files)
+    remove_stale_files(output_dir, stem, paths)
+    return paths
@@ -0,0 +1,67 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Sequence, TextIO, Tuple
+from .skill_crawler import make_skill_from_line, select_skill_area
+from .html_generator import join_cards, num_in_a_page, render_card, write_pages
+
+
+# Chunks are made smaller than this only for small inputs
+min_chunk_lines = 256
+# Number of chunks given to each worker, to even out their loads
+chunks_per_job = 4
+
+Chunk = Tuple[Sequence[str], bool, bool, bool, bool, bool]
+
+
+def render_chunk(chunk: Chunk) -> List[str]:
+    """Parse lines of a skill area and render cards of their skills."""
+    lines, sl_as_limit, is_sleeve_mode, large, use_template, compact = chunk
+    cards = []
+    for line in lines:
+        skill = make_skill_from_line(line, sl_as_limit)
+        if skill is not None:
+            cards.append(render_card(skill, is_sleeve_mode, large, use_template,
+                                     compact))
+    return cards
+
+
+def split_chunks(lines: Sequence[str], jobs: int) -> List[Sequence[str]]:
+    """Split lines into chunks of about the same number of lines."""
+    chunk_lines = max(min_chunk_lines, -(-len(lines) // (jobs * chunks_per_job)))
+    return [lines[begin:begin + chunk_lines]
+            for begin in range(0, len(lines), chunk_lines)]
+
+
+def _pages(card_lists: Iterator[List[str]], compact: bool) -> Iterator[str]:
+    cards: List[str] = []
+    for card_list in card_lists:
+        cards += card_list
+        while len(cards) >= num_in_a_page:
+            yield join_cards(cards[:num_in_a_page], compact)
+            del cards[:num_in_a_page]
+    if cards:
+        yield join_cards(cards, compact)
+
+
+def write_html_parallel(
+    text: str,
+    stream: TextIO,
+    is_sleeve_mode: bool,
+    large: bool,
+    sl_as_limit: bool,
+    use_template: bool = False,
+    jobs: int = 2,
+    compact: bool = False
+) -> None:
+    """Write html of a charasheet, parsing and rendering in jobs processes.
+
+    The skill area is split into chunks of lines, whose cards are rendered
+    in workers and put into pages in the original order, so the result is
+    the same as skill_crawler.main.
+    """
+    area = select_skill_area(text.split('\n'))
+    chunks = [(chunk_lines, sl_as_limit, is_sleeve_mode, large, use_template,
+               compact)
+              for chunk_lines in split_chunks(area, jobs)]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        write_pages(_pages(executor.map(render_chunk, chunks), compact), stream,
+                    is_sleeve_mode, use_template, compact=compact)
@@ -0,0 +1,116 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from .skill import Skill
+from .sqlite_store import SqliteStore, default_max_entries
+
+# hashlib, json and skill_record are imported only when ParseCache is used,
+# since they take long to import compared with a run without cache.
+
+
+def parser_version() -> str:
+    """Fingerprint of the parser, changed whenever its code or tables change.
+
+    mojimoji is included, since it normalizes the lines before parsing. It
+    has no version attribute, so its module file is hashed instead.
+    """
+    import hashlib
+    import mojimoji
+    digest = hashlib.sha256()
+    for path in sorted(Path(__file__).parent.glob('*.py')):
+        digest.update(path.name.encode('utf-8'))
+        digest.update(path.read_bytes())
+    digest.update(Path(mojimoji.__file__).read_bytes())
+    return digest.hexdigest()
+
+
+class SkillCache(ABC):
+    """Cache of skills parsed from (preprocessed) lines."""
+
+    @abstractmethod
+    def get(self, line: str, sl_as_limit: bool) -> Tuple[bool, Optional[Skill]]:
+        """Return whether the line is cached and its skill if so."""
+
+    @abstractmethod
+    def put(self, line: str, sl_as_limit: bool, skill: Optional[Skill]) -> None:
+        pass
+
+
+class MemorySkillCache(SkillCache):
+    """In-memory cache which keeps the skills of the latest generation.
+
+    Skills are kept as they are, so the same line gives the same object.
+    Entries not used since the previous call of next_generation are dropped
+    by the next call.
+    """
+
+    def __init__(self) -> None:
+        self._previous: Dict[Tuple[str, bool], Optional[Skill]] = {}
+        self._current: Dict[Tuple[str, bool], Optional[Skill]] = {}
+
+    def get(self, line: str, sl_as_limit: bool) -> Tuple[bool, Optional[Skill]]:
+        key = (line, sl_as_limit)
+        if key in self._current:
+            return True, self._current[key]
+        if key in self._previous:
+            skill = self._previous[key]
+            self._current[key] = skill
+            return True, skill
+        return False, None
+
+    def put(self, line: str, sl_as_limit: bool, skill: Optional[Skill]) -> None:
+        self._current[(line, sl_as_limit)] = skill
+
+    def next_generation(self) -> None:
+        self._previous = self._current
+        self._current = {}
+
+
+class ParseCache(SkillCache):
+    """On-disk cache of skills parsed from (preprocessed) lines.
+
+    Skills are kept in a SqliteStore as JSON of their records, whose entries
+    are all dropped when the parser changes.
+    """
+
+    def __init__(self, path: Path, max_entries: int = default_max_entries) -> None:
+        self._store = SqliteStore(path, 'skills', parser_version, max_entries)
+
+    @staticmethod
+    def _key(line: str, sl_as_limit: bool) -> str:
+        import hashlib
+        return hashlib.sha256(
+            f'{int(sl_as_limit)}:{line}'.encode('utf-8')).hexdigest()
+
+    def get(self, line: str, sl_as_limit: bool) -> Tuple[bool, Optional[Skill]]:
+        """Return whether the line is cached and its skill if so."""
+        import json
+        from .skill_record import RecordError, decode_record
+        value = self._store.get(self._key(line, sl_as_limit))
+        if value is None:
+            return False, None
+        try:
+            record = json.loads(value)
+            return True, None if record is None else decode_record(record)
+        except (ValueError, RecordError):
+            # A broken entry is parsed again and overwritten
+            return False, None
+
+    def put(self, line: str, sl_as_limit: bool, skill: Optional[Skill]) -> None:
+        import json
+        from .skill_record import encode_record
+        record = None if skill is None else encode_record(skill)
+        value = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        self._store.put(self._key(line, sl_as_limit), value)
+
+    def flush(self) -> None:
+        self._store.flush()
+
+    def close(self) -> None:
+        self._store.close()
+
+    def __enter__(self) -> 'ParseCache':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,213 @@
+import json
+import time
+import tracemalloc
+from sys import stderr
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+from . import skill_crawler, html_generator
+from .judge import Judge, JudgeKind
+from .target import Target, TargetKind
+from .skill_range import SkillRange, SkillRangeKind
+
+
+T = TypeVar('T')
+
+# tracemalloc.reset_peak is available since Python 3.9
+reset_peak: Optional[Callable[[], None]] = getattr(tracemalloc, 'reset_peak', None)
+
+
+class StageStat:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak_bytes: Optional[int] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'calls': self.calls, 'seconds': self.seconds,
+                'peak_bytes': self.peak_bytes}
+
+
+class Profiler:
+    """Record time and allocation peaks of each stage of the pipeline.
+
+    While installed, the functions of each stage are replaced with profiled
+    ones, so nothing is changed unless profiling is enabled.
+    Stage times are inclusive: e.g. make_skill_from_line includes
+    preprocess_line and make_skill_from_text. Before Python 3.9, a peak of a
+    stage lower than an earlier peak is measured at the stage boundaries.
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, StageStat] = {}
+        self.lines_scanned = 0
+        self.skills_produced = 0
+        self.lines_rejected = 0
+        self.fallbacks = {'target': 0, 'judge': 0, 'skill_range': 0}
+        self._stack: List[Tuple[StageStat, int]] = []
+        self._patches: List[Tuple[Any, str, Any]] = []
+        self._total_seconds = 0.0
+        self._begin = 0.0
+        self._last_peak = 0
+
+    def _update_peaks(self) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        if reset_peak is not None:
+            reset_peak()
+        elif peak > self._last_peak:
+            # A new peak is reached since the last stage boundary
+            self._last_peak = peak
+        else:
+            # An earlier peak is not exceeded, so the peak since the last
+            # boundary is unknown without reset_peak, and is bounded by the
+            # memory traced now
+            peak = current
+        for stat, base in self._stack:
+            if stat.peak_bytes is None or stat.peak_bytes < peak - base:
+                stat.peak_bytes = peak - base
+
+    def _enter(self, stage: str) -> StageStat:
+        self._update_peaks()
+        stat = self.stages.setdefault(stage, StageStat())
+        base = tracemalloc.get_traced_memory()[0]
+        self._stack.append((stat, base))
+        return stat
+
+    def _exit(self) -> None:
+        self._update_peaks()
+        self._stack.pop()
+
+    def call(self, stage: str, function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        stat = self._enter(stage)
+        begin = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stat.seconds += time.perf_counter() - begin
+            stat.calls += 1
+            self._exit()
+
+    def iterate(self, stage: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Profile each step of an iterator as a call of the stage."""
+        iterator = iter(iterable)
+        while True:
+            try:
+                item = self.call(stage, next, iterator)
+            except StopIteration:
+                return
+            yield item
+
+    def count_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        for line in self.iterate('read', lines):
+            self.lines_scanned += 1
+            yield line
+
+    def _patch(self, owner: Any, name: str, replacement: Any) -> None:
+        self._patches.append((owner, name, owner.__dict__[name]))
+        setattr(owner, name, replacement)
+
+    def _wrap(self, owner: Any, name: str, stage: str,
+              check: Optional[Callable[[Any], None]] = None) -> None:
+        original = getattr(owner, name)
+
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            result = self.call(stage, original, *args, **kwargs)
+            if check is not None:
+                check(result)
+            return result
+
+        if isinstance(owner, type):
+            self._patch(owner, name, staticmethod(wrapper))
+        else:
+            self._patch(owner, name, wrapper)
+
+    def _check_skill(self, skill: Any) -> None:
+        if skill is None:
+            self.lines_rejected += 1
+        else:
+            self.skills_produced += 1
+
+    def _check_target(self, target: Target) -> None:
+        if target.kind is TargetKind.string:
+            self.fallbacks['target'] += 1
+
+    def _check_judge(self, result: Tuple[Judge, Optional[int]]) -> None:
+        if result[0].kind is JudgeKind.string:
+            self.fallbacks['judge'] += 1
+
+    def _check_skill_range(self, skill_range: SkillRange) -> None:
+        if skill_range.kind is SkillRangeKind.string:
+            self.fallbacks['skill_range'] += 1
+
+    def _wrap_iter_skills(self) -> None:
+        original = skill_crawler.iter_skills
+
+        def wrapper(lines: Iterable[str], *args: Any, **kwargs: Any) -> Iterator[Any]:
+            return self.iterate(
+                'iter_skills', original(self.count_lines(lines), *args, **kwargs))
+
+        self._patch(skill_crawler, 'iter_skills', wrapper)
+
+    def install(self) -> None:
+        self._wrap_iter_skills()
+        self._wrap(skill_crawler, 'make_skill_from_line', 'make_skill_from_line',
+                   self._check_skill)
+        self._wrap(skill_crawler, 'preprocess_line', 'preprocess_line')
+        self._wrap(skill_crawler, 'split_skill_fields', 'split_skill_fields')
+        self._wrap(skill_crawler, 'make_skill_from_text', 'make_skill_from_text')
+        self._wrap(skill_crawler, 'split_effect', 'split_effect')
+        self._wrap(skill_crawler, 'unify_effect', 'unify_effect')
+        self._wrap(Target, 'from_text', 'Target.from_text', self._check_target)
+        self._wrap(Judge, 'from_text', 'Judge.from_text', self._check_judge)
+        self._wrap(SkillRange, 'from_text', 'SkillRange.from_text',
+                   self._check_skill_range)
+        self._wrap(html_generator, 'render_page', 'render_page')
+        self._wrap(html_generator, 'write_pages', 'write_pages')
+
+    def uninstall(self) -> None:
+        while self._patches:
+            owner, name, original = self._patches.pop()
+            setattr(owner, name, original)
+
+    def __enter__(self) -> 'Profiler':
+        self.install()
+        tracemalloc.start()
+        self._last_peak = 0
+        self._begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._total_seconds = time.perf_counter() - self._begin
+        tracemalloc.stop()
+        self.uninstall()
+
+    def report(self) -> Dict[str, Any]:
+        stages = {name: stat.as_dict() for name, stat in self.stages.items()}
+        if 'iter_skills' in self.stages:
+            # Time spent on tracking skill areas itself
+            stages['section_tracking'] = {
+                'calls': self.stages['iter_skills'].calls,
+                'seconds': sum(
+                    sign * self.stages[name].seconds
+                    for sign, name in [(1, 'iter_skills'), (-1, 'read'),
+                                       (-1, 'make_skill_from_line')]
+                    if name in self.stages),
+                'peak_bytes': None,
+            }
+        return {
+            'total_seconds': self._total_seconds,
+            'stages': stages,
+            'lines': {
+                'scanned': self.lines_scanned,
+                'skills': self.skills_produced,
+                'rejected': self.lines_rejected,
+            },
+            'fallbacks': self.fallbacks,
+        }
+
+    def write_report(self, path: str) -> None:
+        """Write the report as json into path, or stderr if path is '-'."""
+        text = json.dumps(self.report(), indent=2, ensure_ascii=False)
+        if path == '-':
+            print(text, file=stderr)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
@@ -2,7 +2,6 @@ from __future__ import annotations
 
 from typing import Sequence, Tuple, Optional
 import re
-import mojimoji
 from .normalized_check import normalize_and_compare
 
 
@@ -40,6 +39,9 @@ class RubyString:
     def get_base(self) -> str:
         return ''.join([base for base, ruby in self._strings_with_rubys])
 
+    def get_segments(self) -> Tuple[Tuple[str, Optional[str]], ...]:
+        return tuple(self._strings_with_rubys)
+
     @staticmethod
     def from_text(text: str) -> RubyString:
         result = []
@@ -0,0 +1,396 @@
+import asyncio
+import gzip
+import hashlib
+import io
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from sys import stderr
+from typing import Dict, List, Optional, TextIO, Tuple
+from urllib.parse import parse_qs, urlsplit
+from .skill_crawler import iter_skills
+from .fragment_cache import FragmentCache
+from .html_generator import gzip_level
+
+
+default_host = '127.0.0.1'
+default_port = 8080
+max_body_size = 16 * 1024 * 1024
+max_cached_responses = 64
+
+# Upper bounds of the latency histogram in seconds
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+reasons = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+    431: 'Request Header Fields Too Large',
+    500: 'Internal Server Error',
+}
+
+endpoints = {'/': 'render', '/render': 'render', '/metrics': 'metrics'}
+
+true_values = {'', '1', 'true', 'yes', 'on'}
+
+
+# Etag, html and gzipped html of a rendered sheet
+Response = Tuple[str, bytes, Optional[bytes]]
+
+
+class HttpError(Exception):
+    def __init__(self, status: int) -> None:
+        super().__init__(reasons[status])
+        self.status = status
+
+
+@dataclass(frozen=True)
+class RenderOptions:
+    """Options of a render request, given as query parameters."""
+
+    is_sleeve_mode: bool = False
+    large: bool = False
+    sl_as_limit: bool = False
+    use_template: bool = False
+    compact: bool = False
+
+    @staticmethod
+    def from_query(
+        query: str,
+        defaults: Optional['RenderOptions'] = None
+    ) -> 'RenderOptions':
+        """Parse options, taking the ones not in the query from defaults."""
+        params = parse_qs(query, keep_blank_values=True)
+        if defaults is None:
+            defaults = RenderOptions()
+
+        def flag(default: bool, *names: str) -> bool:
+            given = [name for name in names if name in params]
+            if not given:
+                return default
+            return any(params[name][-1].lower() in true_values
+                       for name in given)
+
+        return RenderOptions(
+            flag(defaults.is_sleeve_mode, 'sleeve'),
+            flag(defaults.large, 'large'),
+            flag(defaults.sl_as_limit, 'sl-as-limitation', 'sl_as_limitation'),
+            flag(defaults.use_template, 'template'),
+            flag(defaults.compact, 'compact'))
+
+
+class LatencyHistogram:
+    """Cumulative histogram of request latencies for each endpoint."""
+
+    def __init__(self, buckets: Tuple[float, ...] = latency_buckets) -> None:
+        self._buckets = buckets
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+
+    def observe(self, endpoint: str, seconds: float) -> None:
+        counts = self._counts.setdefault(
+            endpoint, [0] * (len(self._buckets) + 1))
+        for i, bound in enumerate(self._buckets):
+            if seconds <= bound:
+                counts[i] += 1
+        counts[-1] += 1
+        self._sums[endpoint] = self._sums.get(endpoint, 0.0) + seconds
+
+    def exposition(self, name: str) -> List[str]:
+        """Return lines in the Prometheus text format."""
+        lines = [f'# TYPE {name} histogram']
+        for endpoint in sorted(self._counts):
+            counts = self._counts[endpoint]
+            bounds = [repr(bound) for bound in self._buckets] + ['+Inf']
+            for bound, count in zip(bounds, counts):
+                lines.append(
+                    f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+            lines.append(
+                f'{name}_sum{{endpoint="{endpoint}"}} {self._sums[endpoint]}')
+            lines.append(f'{name}_count{{endpoint="{endpoint}"}} {counts[-1]}')
+        return lines
+
+
+def render_sheet(
+    sheet: str,
+    options: RenderOptions,
+    fragment_cache: FragmentCache
+) -> str:
+    """Render a sheet into html in the same way as main.py does from stdin."""
+    output = io.StringIO()
+    fragment_cache.write_html(
+        iter_skills(io.StringIO(sheet), options.sl_as_limit), output,
+        options.is_sleeve_mode, options.large, options.use_template,
+        options.compact)
+    return output.getvalue()
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def gzip_etag(etag: str) -> str:
+    """Return the etag of the gzipped variant of a response."""
+    return etag[:-1] + '-gzip"'
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Return whether an Accept-Encoding header accepts gzip."""
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        if coding.strip().lower() in ('gzip', '*'):
+            name, _, value = params.partition('=')
+            if name.strip().lower() != 'q':
+                return True
+            try:
+                return float(value) > 0
+            except ValueError:
+                return False
+    return False
+
+
+class RenderServer:
+    """Render sheets posted over http, keeping parsers and css warm.
+
+    POST / with a sheet as the body returns html, with options such as
+    /?sleeve&large given as query parameters. GET /metrics returns
+    latency histograms and response counts.
+
+    Options not given in a query are taken from defaults, so that html is
+    compact unless ?compact=0 if defaults are compact. Html is gzipped for
+    clients accepting it if compress is set, and cards are also cached in
+    fragment_cache_path if it is given.
+    """
+
+    def __init__(
+        self,
+        defaults: RenderOptions = RenderOptions(),
+        compress: bool = False,
+        fragment_cache_path: Optional[Path] = None
+    ) -> None:
+        self._defaults = defaults
+        self._compress = compress
+        self._latencies = LatencyHistogram()
+        self._statuses: Dict[int, int] = {}
+        # Cards are shared by requests rendered in any thread
+        self._fragment_cache = FragmentCache(fragment_cache_path)
+        # Recently rendered responses keyed by options and sheet hash
+        self._responses: 'OrderedDict[Tuple[RenderOptions, bytes], Response]' \
+            = OrderedDict()
+
+    async def render(self, sheet: bytes, options: RenderOptions) -> 'Response':
+        """Return the etag, the html and the gzipped html of a sheet.
+
+        The gzipped html is None unless compress is set.
+        """
+        key = (options, hashlib.sha256(sheet).digest())
+        response = self._responses.get(key)
+        if response is not None:
+            self._responses.move_to_end(key)
+            return response
+        try:
+            text = sheet.decode('utf-8')
+        except UnicodeDecodeError:
+            raise HttpError(400)
+        # Rendering is done in a thread so that other requests are served
+        loop = asyncio.get_running_loop()
+        html = await loop.run_in_executor(
+            None, render_sheet, text, options, self._fragment_cache)
+        body = html.encode('utf-8')
+        gzipped = None
+        if self._compress:
+            gzipped = gzip.compress(body, gzip_level)
+        response = (make_etag(body), body, gzipped)
+        self._responses[key] = response
+        if len(self._responses) > max_cached_responses:
+            self._responses.popitem(last=False)
+        return response
+
+    def close(self) -> None:
+        self._fragment_cache.close()
+
+    def metrics(self) -> bytes:
+        lines = self._latencies.exposition(
+            'skill_cards_request_duration_seconds')
+        lines.append('# TYPE skill_cards_responses_total counter')
+        for status in sorted(self._statuses):
+            lines.append(f'skill_cards_responses_total{{status="{status}"}} '
+                         f'{self._statuses[status]}')
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    async def respond(
+        self,
+        method: str,
+        target: str,
+        headers: Dict[str, str],
+        body: bytes
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """Return the status, headers and body of a response."""
+        url = urlsplit(target)
+        if url.path == '/metrics':
+            if method != 'GET':
+                raise HttpError(405)
+            return 200, {'Content-Type': 'text/plain; version=0.0.4'}, self.metrics()
+        if endpoints.get(url.path) != 'render':
+            raise HttpError(404)
+        if method != 'POST':
+            raise HttpError(405)
+        etag, html, gzipped = await self.render(
+            body, RenderOptions.from_query(url.query, self._defaults))
+        response_headers = {}
+        if gzipped is not None:
+            response_headers['Vary'] = 'Accept-Encoding'
+            if not accepts_gzip(headers.get('accept-encoding', '')):
+                gzipped = None
+        if gzipped is not None:
+            etag = gzip_etag(etag)
+        response_headers['ETag'] = etag
+        if_none_match = [tag.strip() for tag
+                         in headers.get('if-none-match', '').split(',')]
+        if etag in if_none_match or '*' in if_none_match:
+            return 304, response_headers, b''
+        response_headers['Content-Type'] = 'text/html; charset=utf-8'
+        if gzipped is not None:
+            response_headers['Content-Encoding'] = 'gzip'
+            return 200, response_headers, gzipped
+        return 200, response_headers, html
+
+    async def handle(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve requests on a connection until it is closed."""
+        try:
+            keep_alive = True
+            while keep_alive:
+                start = time.perf_counter()
+                endpoint = 'other'
+                try:
+                    request_line = await _read_line(reader, 400)
+                    if not request_line.strip():
+                        break
+                    start = time.perf_counter()
+                    method, target, version, headers = await _read_head(
+                        request_line, reader)
+                    endpoint = endpoints.get(urlsplit(target).path, 'other')
+                    keep_alive = (version == 'HTTP/1.1'
+                                  and headers.get('connection', '').lower() != 'close')
+                    body = await _read_body(headers, reader)
+                    status, response_headers, response_body = await self.respond(
+                        method, target, headers, body)
+                except HttpError as error:
+                    keep_alive = False
+                    status, response_headers = error.status, {}
+                    response_body = (reasons[status] + '\n').encode('utf-8')
+                except Exception as error:
+                    print(f'{type(error).__name__}: {error}', file=stderr)
+                    keep_alive = False
+                    status, response_headers = 500, {}
+                    response_body = (reasons[status] + '\n').encode('utf-8')
+                _write_response(writer, status, response_headers,
+                                response_body, keep_alive)
+                await writer.drain()
+                self._statuses[status] = self._statuses.get(status, 0) + 1
+                self._latencies.observe(endpoint, time.perf_counter() - start)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _read_line(reader: asyncio.StreamReader, status: int) -> bytes:
+    """Read a line, failing with status if it is longer than the stream limit."""
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise HttpError(status)
+
+
+async def _read_head(
+    request_line: bytes,
+    reader: asyncio.StreamReader
+) -> Tuple[str, str, str, Dict[str, str]]:
+    try:
+        method, target, version = request_line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(400)
+    headers: Dict[str, str] = {}
+    while True:
+        line = (await _read_line(reader, 431)).decode('latin-1')
+        if line in ('\r\n', '\n', ''):
+            break
+        name, colon, value = line.partition(':')
+        if not colon:
+            raise HttpError(400)
+        headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+async def _read_body(headers: Dict[str, str], reader: asyncio.StreamReader) -> bytes:
+    if 'content-length' not in headers:
+        if 'transfer-encoding' in headers:
+            raise HttpError(411)
+        return b''
+    try:
+        length = int(headers['content-length'])
+    except ValueError:
+        raise HttpError(400)
+    if length < 0:
+        raise HttpError(400)
+    if length > max_body_size:
+        raise HttpError(413)
+    return await reader.readexactly(length)
+
+
+def _write_response(
+    writer: asyncio.StreamWriter,
+    status: int,
+    headers: Dict[str, str],
+    body: bytes,
+    keep_alive: bool
+) -> None:
+    head = [f'HTTP/1.1 {status} {reasons[status]}']
+    head.extend(f'{name}: {value}' for name, value in headers.items())
+    head.append(f'Content-Length: {len(body)}')
+    if not keep_alive:
+        head.append('Connection: close')
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+
+
+async def _serve(
+    host: str,
+    port: int,
+    report: TextIO,
+    defaults: RenderOptions,
+    compress: bool,
+    fragment_cache_path: Optional[Path]
+) -> None:
+    render_server = RenderServer(defaults, compress, fragment_cache_path)
+    try:
+        server = await asyncio.start_server(render_server.handle, host, port)
+        print(f'Serving on http://{host}:{port}/', file=report)
+        async with server:
+            await server.serve_forever()
+    finally:
+        render_server.close()
+
+
+def serve(
+    port: int = default_port,
+    report: TextIO = stderr,
+    defaults: RenderOptions = RenderOptions(),
+    compress: bool = False,
+    fragment_cache_path: Optional[Path] = None
+) -> None:
+    """Serve rendering on localhost until interrupted."""
+    try:
+        asyncio.run(_serve(default_host, port, report, defaults, compress,
+                           fragment_cache_path))
+    except KeyboardInterrupt:
+        pass
@@ -1,5 +1,5 @@
-from dataclasses import dataclass, field
-from typing import Optional
+from dataclasses import dataclass, field, fields
+from typing import Optional, Type, TypeVar
 from .skill_range import SkillRange
 from .judge import Judge
 from .classifier import Classifier
@@ -8,6 +8,24 @@ from .cost import Cost
 from .ruby_string import RubyString
 
 
+T = TypeVar('T')
+
+
+def with_slots(cls: Type[T]) -> Type[T]:
+    """Rebuild a dataclass with __slots__ of its fields.
+
+    Defaults of fields are kept in __init__, so the class attributes
+    conflicting with the slots can be dropped.
+    """
+    namespace = dict(cls.__dict__)
+    field_names = tuple(f.name for f in fields(cls))  # type: ignore
+    namespace['__slots__'] = field_names
+    for name in field_names + ('__dict__', '__weakref__'):
+        namespace.pop(name, None)
+    return type(cls)(cls.__name__, cls.__bases__, namespace)  # type: ignore
+
+
+@with_slots
 @dataclass
 class Skill:
     """Skill object in Arianrhod."""
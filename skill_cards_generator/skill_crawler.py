@@ -1,36 +1,55 @@
+import os
 import re
-from typing import Optional, List, Tuple, Set
-from sys import stdin
-import mojimoji
+from typing import (
+    Optional, List, Tuple, Set, Dict, Iterable, Iterator, Match, Pattern, Sequence)
+from sys import stdin, stdout
+from contextlib import ExitStack
+from pathlib import Path
 from .skill import Skill
 from .skill_range import SkillRange
 from .judge import Judge
-from .html_generator import generate_html
+from .html_generator import gzip_stream, write_html
 from .classifier import Classifier
 from .target import Target
 from .cost import Cost
 from .ruby_string import RubyString
-from .normalized_check import normalize_and_check_with_default
+from .normalized_check import compile_table, normalize_and_check_with_default
+from .parse_cache import SkillCache, ParseCache, default_max_entries
+from .zenhan import han_to_zen, han_to_zen_token, kana_to_zen
 
 
+# Layout of a skill line, which split_skill_fields splits in linear time
 skill_regex = re.compile(
     r'^《([^/]+)》\s*([^《》\s/]+)\s*/\s*([^\s/]*)\s*/\s*([^\s/]*)\s*/\s*([^\s/]*)\s*/\s*([^\s/]*)\s*/\s*([^\s/]*)\s*/\s*([^\s/]*)\s*/\s*(.*)$')
+# skill_regex with the spaces around an empty field and before the effect
+# matched in only one way, so that long runs of spaces do not make it
+# backtrack. Empty fields do not participate in the match.
+skill_fields_regex = re.compile(
+    r'《([^/]+)》\s*([^《》\s/]+)\s*/\s*(?:([^\s/]+)\s*)?/\s*(?:([^\s/]+)\s*)?/\s*(?:([^\s/]+)\s*)?/\s*(?:([^\s/]+)\s*)?/\s*(?:([^\s/]+)\s*)?/\s*(?:([^\s/]+)\s*)?/\s*(?!\s)(.*)')
 skill_area_begin_regex = re.compile(r'^■スキル■$', re.MULTILINE)
 skill_area_end_regex = re.compile(r'^■コネクション■$', re.MULTILINE)
+# Layouts of critical and flavor text in an effect, which find_critical and
+# find_flavor search for in linear time
 critical_regex = re.compile(
     r'(cri?t?|critic(al)?|crl|クリ((ティ)?カル)?)([:>：＞〉→]|->|=>)\s*(?P<text>.+?)[。\n$]')
 flavor_regex = re.compile(
     r'(((fl(av(ou?r)?)?|フレーバー?)([:>：＞〉→]|->|=>))|##)\s*(?P<text>.+?[。\s\n]*)$'
 )
+critical_keywords = ('crit', 'cri', 'crt', 'cr', 'critical', 'critic', 'crl',
+                     'クリティカル', 'クリカル', 'クリ')
+flavor_keywords = ('flavour', 'flavor', 'flav', 'fl', 'フレーバー', 'フレーバ')
+keyword_separators = frozenset(':>：＞〉→')
+critical_terminators = ('。', '\n', '$')
+# Every position where a keyword may begin, found in one scan
+critical_head_regex = re.compile(r'(?=cr|クリ)')
+flavor_head_regex = re.compile(r'(?=fl|フレーバ|##)')
 symbol_set = {':', '：', '.', '。', ',', '、', '(', '（', ')', '）',
               '[', ']', '「', '」', '［', '］', '{', '}', '｛', '｝', '<', '>',
               '＜', '＞', '〈', '〉', '《', '》', '-', 'ー', '=', '＝',
               '+', '＋', '*', '＊', '×'}
 symbols = re.escape(''.join(list(symbol_set)))
-d_bracket_regex_before = re.compile(
-    r'(?P<before>[^\s' + symbols + r'])(?P<text>《.+?》)')
-d_bracket_regex_after = re.compile(
-    r'(?P<text>《.+?》)(?P<after>[^\s' + symbols + r'])')
+d_bracket_regex = re.compile(r'[《》]')
+spacing_boundary_regex = re.compile(r'[\s' + symbols + r']')
 
 
 replace_text_slash = '___SLASH___'
@@ -59,6 +78,8 @@ unify_critical_table: List[Tuple[str, Set[str]]] = [
     ('ダイスロール増加', {'ダイスロール増', 'DR増加', 'DR増', 'D増', 'DR', '増加', '増'}),
     ('コスト０', {'0', 'コスト0', 'cost0', 'cost', 'ct0', 'ct'})
 ]
+unify_timing_index = compile_table(unify_timing_table)
+unify_critical_index = compile_table(unify_critical_table)
 
 unify_effect_table: List[Tuple[str, str]] = [
     ('ｄ', 'Ｄ'),
@@ -79,12 +100,45 @@ unify_effect_table: List[Tuple[str, str]] = [
 ]
 
 
+def _compile_effect_table(
+    table: List[Tuple[str, str]]
+) -> Tuple[Dict[int, str], Pattern[str], List[Tuple[str, int]]]:
+    """Compile the effect table into a translation and a combined regex.
+
+    Single character entries become a translation applied beforehand.
+    For the others, the suffix shared by the text before and after
+    replacement is only looked ahead, so that a replacement can still be
+    followed by another one starting with it (e.g. '。' of '。拒否可能。').
+    """
+    translation = str.maketrans(
+        {before: after for before, after in table
+         if len(before) == len(after) == 1})
+    patterns = []
+    replacements = []
+    for before, after in table:
+        if len(before) == len(after) == 1:
+            continue
+        suffix_len = len(os.path.commonprefix([before[::-1], after[::-1]]))
+        suffix_len = min(suffix_len, len(before) - 1)
+        prefix = before[:len(before) - suffix_len]
+        suffix = before[len(prefix):]
+        patterns.append(f'({re.escape(prefix)})(?={re.escape(suffix)})')
+        replacements.append((after[:len(after) - suffix_len], suffix_len))
+    return translation, re.compile('|'.join(patterns)), replacements
+
+
+unify_effect_translation, unify_effect_regex, unify_effect_replacements = \
+    _compile_effect_table(unify_effect_table)
+unify_effect_symbol_translation = str.maketrans({'*': '×', '＊': '×'})
+
+
 def unify_timing(timing: str) -> str:
-    return normalize_and_check_with_default(timing, unify_timing_table, timing)
+    return normalize_and_check_with_default(timing, unify_timing_index, timing)
 
 
 def unify_critical(critical: str) -> str:
-    return normalize_and_check_with_default(critical, unify_critical_table, critical)
+    return normalize_and_check_with_default(
+        critical, unify_critical_index, critical)
 
 
 def unify_limitation(limitation: str) -> Optional[str]:
@@ -94,7 +148,7 @@ def unify_limitation(limitation: str) -> Optional[str]:
             before = slash_separated[0]
             after = slash_separated[1]
             after = normalize_and_check_with_default(
-                after, unify_timing_table, after)
+                after, unify_timing_index, after)
             return f'{after}{before}回'
         if word in {'', '-', 'ー'}:
             return None
@@ -108,40 +162,72 @@ def unify_limitation(limitation: str) -> Optional[str]:
                 continue
             result = unify_limitation_with_one_word(limitation_sep)
             if result is not None:
-                result = mojimoji.han_to_zen(result.upper())
+                result = han_to_zen_token(result.upper())
                 results.append(result)
     if len(results) == 0:
         return None
     return '、'.join(results)
 
 
+def space_d_brackets(text: str) -> str:
+    """Space out 《》 in one sweep, e.g. この《スキル》による -> この 《スキル》 による."""
+    lines = text.split('\n')
+    for line_id, line in enumerate(lines):
+        # Only brackets which can be paired in the same line are spaced
+        first_open = line.find('《')
+        last_close = line.rfind('》')
+        if first_open == -1 or last_close < first_open + 2:
+            continue
+        pieces = []
+        last_pos = 0
+        for match in d_bracket_regex.finditer(line, first_open, last_close + 1):
+            pos = match.start()
+            if match.group() == '《':
+                if (0 < pos <= last_close - 2
+                        and spacing_boundary_regex.match(line, pos - 1) is None):
+                    pieces.append(line[last_pos:pos])
+                    pieces.append(' ')
+                    last_pos = pos
+            elif (first_open + 2 <= pos < len(line) - 1
+                    and spacing_boundary_regex.match(line, pos + 1) is None):
+                pieces.append(line[last_pos:pos + 1])
+                pieces.append(' ')
+                last_pos = pos + 1
+        pieces.append(line[last_pos:])
+        lines[line_id] = ''.join(pieces)
+    return '\n'.join(lines)
+
+
+def replace_effect_table(text: str) -> str:
+    """Apply unify_effect_table as if each entry were replaced in turn."""
+    text = text.translate(unify_effect_translation)
+    # Like str.replace, an entry is not replaced where it overlaps itself
+    replaced_until = [0] * len(unify_effect_replacements)
+
+    def replace(match: Match[str]) -> str:
+        assert match.lastindex is not None
+        entry_id = match.lastindex - 1
+        after, suffix_len = unify_effect_replacements[entry_id]
+        if match.start() < replaced_until[entry_id]:
+            return match.group()
+        replaced_until[entry_id] = match.end() + suffix_len
+        return after
+
+    return unify_effect_regex.sub(replace, text)
+
+
 def unify_effect(text: str) -> str:
     # * -> ×
-    origin = ['*', '＊']
-    target = '×'
-    for o in origin:
-        text = text.replace(o, target)
+    text = text.translate(unify_effect_symbol_translation)
 
     # Hankaku -> Zenkaku
-    text = mojimoji.han_to_zen(text)
+    text = han_to_zen(text)
 
     # この《スキル》による -> この 《スキル》 による
-    while True:
-        match = d_bracket_regex_before.search(text)
-        if match is None:
-            break
-        text = (text[: match.start()] + match.group('before')
-                + ' ' + match.group('text') + text[match.end():])
-    while True:
-        match = d_bracket_regex_after.search(text)
-        if match is None:
-            break
-        text = (text[: match.start()] + match.group('text')
-                + ' ' + match.group('after') + text[match.end():])
+    text = space_d_brackets(text)
 
     # Replace text
-    for before, after in unify_effect_table:
-        text = text.replace(before, after)
+    text = replace_effect_table(text)
 
     if len(text) > 0 and text[-1] != '。':
         text = text + '。'
@@ -149,6 +235,85 @@ def unify_effect(text: str) -> str:
     return text
 
 
+def _keyword_end(text: str, position: int, keywords: Sequence[str]) -> int:
+    """Return the end of a keyword and a separator at position, or -1."""
+    for keyword in keywords:
+        if text.startswith(keyword, position):
+            end = position + len(keyword)
+            if text[end:end + 1] in keyword_separators:
+                return end + 1
+            if text.startswith('->', end) or text.startswith('=>', end):
+                return end + 2
+    return -1
+
+
+def _space_end(text: str, position: int) -> int:
+    while position < len(text) and text[position].isspace():
+        position += 1
+    return position
+
+
+def find_critical(text: str) -> Optional[Tuple[int, int, str]]:
+    """Find critical text as critical_regex.search in linear time.
+
+    Return the start and the end of the match and the critical text, or
+    None. Spaces after each keyword are scanned once, since they are
+    bounded by the keyword and the next non-space character.
+    """
+    last_terminator = max(text.rfind(terminator)
+                          for terminator in critical_terminators)
+    for head in critical_head_regex.finditer(text):
+        begin = _keyword_end(text, head.start(), critical_keywords)
+        if begin == -1 or begin >= last_terminator:
+            continue
+        # The text starts after as many spaces as possible, with a
+        # character other than a line break, before a terminator
+        text_begin = min(_space_end(text, begin), last_terminator - 1)
+        while text_begin >= begin and text[text_begin] == '\n':
+            text_begin -= 1
+        if text_begin < begin:
+            continue
+        text_end = min(position for position in (
+            text.find(terminator, text_begin + 1)
+            for terminator in critical_terminators) if position != -1)
+        return head.start(), text_end + 1, text[text_begin:text_end]
+    return None
+
+
+def find_flavor(text: str) -> Optional[Tuple[int, str]]:
+    """Find flavor text as flavor_regex.search in linear time.
+
+    Return the start of the match, which lasts to the end of text, and the
+    flavor text, or None.
+    """
+    # Line breaks are allowed only in the trailing 。 and spaces
+    trailer = len(text)
+    while trailer > 0 and (text[trailer - 1] == '。'
+                           or text[trailer - 1].isspace()):
+        trailer -= 1
+    last_line_break = text.rfind('\n', 0, trailer)
+    for head in flavor_head_regex.finditer(text):
+        if text.startswith('##', head.start()):
+            begin = head.start() + 2
+        else:
+            begin = _keyword_end(text, head.start(), flavor_keywords)
+            if begin == -1:
+                continue
+        text_begin = _space_end(text, begin)
+        if text_begin == len(text):
+            # Only spaces follow, of which the text is the last ones from
+            # a character other than a line break
+            text_begin -= 1
+            while text_begin >= begin and text[text_begin] == '\n':
+                text_begin -= 1
+            if text_begin < begin:
+                continue
+        elif last_line_break >= text_begin:
+            continue
+        return head.start(), text[text_begin:]
+    return None
+
+
 def split_effect(
     text: str
 ) -> Tuple[Optional[Classifier], str, Optional[str], Optional[str]]:
@@ -164,46 +329,53 @@ def split_effect(
                 text = ''
             else:
                 text = text[delimiter_index + 1:]
-    match_crit = critical_regex.search(text)
-    if match_crit is not None:
-        critical_effect = unify_critical(match_crit.group('text'))
-        if len(text) > match_crit.end():
-            text = text[: match_crit.start()] + text[match_crit.end():]
-        else:
-            text = text[: match_crit.start()]
-    match_flav = flavor_regex.search(text)
-    if match_flav is not None:
-        flavor_text = match_flav.group('text')
-        if len(text) > match_flav.end():
-            text = text[:match_flav.start()] + text[match_flav.end()]
-        else:
-            text = text[:match_flav.start()]
+    critical = find_critical(text)
+    if critical is not None:
+        critical_start, critical_end, critical_text = critical
+        critical_effect = unify_critical(critical_text)
+        text = text[:critical_start] + text[critical_end:]
+    flavor = find_flavor(text)
+    if flavor is not None:
+        # Flavor text lasts to the end of the effect
+        flavor_start, flavor_text = flavor
+        text = text[:flavor_start]
     return classifier, unify_effect(text), critical_effect, flavor_text
 
 
+def split_skill_fields(text: str) -> Optional[Tuple[str, ...]]:
+    """Split a skill line into the same fields as the groups of skill_regex.
+
+    Return None if skill_regex does not match the line, which is decided
+    by the first character for most lines of a sheet.
+    """
+    if not text.startswith('《'):
+        return None
+    match = skill_fields_regex.fullmatch(text)
+    return None if match is None else match.groups('')
+
+
 def make_skill_from_text(text: str, sl_as_limit: bool) -> Optional[Skill]:
-    match = skill_regex.fullmatch(text)
-    if match is None:
+    fields = split_skill_fields(text)
+    if fields is None:
         return None
-    name_raw_str = match.group(1)
+    (name_raw_str, sl_str, timing_str, judge_str, target_str, range_str,
+     cost_str, limitation, effect_str) = fields
     if name_raw_str in ('スキル名', '一般スキル'):
         return None
     elif name_raw_str[0] == name_raw_str[-1] == '■':
         return None
     name = RubyString.from_text(name_raw_str)
-    sl_str = match.group(2)
     try:
         sl = int(sl_str)
     except ValueError:
         sl = 1
     if 7 <= sl <= 9:
         sl -= 5
-    timing = unify_timing(match.group(3))
-    judge, difficulty = Judge.from_text(match.group(4))
-    target = Target.from_text(match.group(5))
-    skill_range = SkillRange.from_text(match.group(6))
-    cost = Cost.from_text(match.group(7))
-    limitation = match.group(8)
+    timing = unify_timing(timing_str)
+    judge, difficulty = Judge.from_text(judge_str)
+    target = Target.from_text(target_str)
+    skill_range = SkillRange.from_text(range_str)
+    cost = Cost.from_text(cost_str)
     level_above = None
     if sl_as_limit:
         level_above = sl
@@ -215,13 +387,13 @@ def make_skill_from_text(text: str, sl_as_limit: bool) -> Optional[Skill]:
             limitation = ''
         except ValueError:
             pass
-    limitation = unify_limitation(limitation)
-    classifier, effect, critical, flavor = split_effect(match.group(9))
+    usage_limitation = unify_limitation(limitation)
+    classifier, effect, critical, flavor = split_effect(effect_str)
 
     effect = cost.as_effect() + effect
     if difficulty is not None:
         additional_text = f'難易度{difficulty}の{judge.to_str(True)}を行なう。'
-        effect = (mojimoji.han_to_zen(additional_text) + effect)
+        effect = (han_to_zen(additional_text) + effect)
 
     return Skill(
         name=name,
@@ -231,7 +403,7 @@ def make_skill_from_text(text: str, sl_as_limit: bool) -> Optional[Skill]:
         target=target,
         skill_range=skill_range,
         cost=cost,
-        usage_limitation=limitation,
+        usage_limitation=usage_limitation,
         skill_class=classifier,
         effect=effect,
         critical=critical,
@@ -240,48 +412,160 @@ def make_skill_from_text(text: str, sl_as_limit: bool) -> Optional[Skill]:
     )
 
 
-def make_skills_from_charasheet(sheet: str, sl_as_limit: bool) -> List[Skill]:
-    # If it seems a entire sheet, drop others
-    match_begin = skill_area_begin_regex.search(sheet)
-    match_end = skill_area_end_regex.search(sheet)
-    if match_begin is not None:
-        begin = match_begin.end()
-    else:
-        begin = 0
-    if match_end is not None:
-        end = match_end.start()
+# Escape slashes like '1/Sn', 'SL/Sr', and so on, and zenkakify all Kana
+# characters, in a single scan of the line
+preprocess_regex = re.compile(
+    r'(?P<slash>(?:(?<=[0-9])|(?<=sl)|(?<=SL))/(?=sn|sr|Sn|Sr|SN|SR|mp|MP|Mp))'
+    r'|(?P<kana>[\uff61-\uff9f]+)')
+
+
+def _preprocess_match(match: Match[str]) -> str:
+    if match.group('slash') is not None:
+        return replace_text_slash
+    return kana_to_zen(match.group('kana'))
+
+
+def preprocess_line(line: str) -> str:
+    return preprocess_regex.sub(_preprocess_match, line)
+
+
+def make_skill_from_line(
+    line: str,
+    sl_as_limit: bool,
+    cache: Optional[SkillCache] = None
+) -> Optional[Skill]:
+    line = preprocess_line(line)
+    if not line.startswith('《'):
+        # Lines which can not be a skill are cheap enough without cache
+        cache = None
+    if cache is not None:
+        is_cached, skill = cache.get(line, sl_as_limit)
+        if is_cached:
+            return skill
+    skill = make_skill_from_text(line, sl_as_limit)
+    if skill is not None and skill.usage_limitation is not None:
+        # Repair escaped slash
+        skill.usage_limitation = skill.usage_limitation.replace(
+            replace_text_slash, '/')
+    if cache is not None:
+        cache.put(line, sl_as_limit, skill)
+    return skill
+
+
+def iter_skills(
+    lines: Iterable[str],
+    sl_as_limit: bool,
+    cache: Optional[SkillCache] = None
+) -> Iterator[Skill]:
+    """Yield skills one by one from the lines of a (part of) charasheet.
+
+    If a skill area marker is found, only the lines inside it are used and
+    skills are yielded as soon as their lines are read.
+    Without the marker the whole input is treated as the skill area, so
+    lines before it are held back unparsed until the end of the input.
+    """
+    lines = iter(lines)
+    pending: List[str] = []
+    is_area_closed = False
+    for line in lines:
+        if line.endswith('\n'):
+            line = line[:-1]
+        if skill_area_begin_regex.fullmatch(line):
+            if is_area_closed:
+                # The area ended before it began, so it is empty
+                return
+            # It seems a entire sheet, drop others
+            break
+        if is_area_closed:
+            continue
+        if skill_area_end_regex.fullmatch(line):
+            is_area_closed = True
+            continue
+        pending.append(line)
     else:
-        end = len(sheet)
-    sheet = sheet[begin:end]
-
-    # Escape slashes like '1/Sn', 'SL/Sr', and so on
-    check_set_before = set([str(i) for i in range(20)] + ['sl', 'SL'])
-    check_set_after = set(
-        ['sn', 'sr', 'Sn', 'Sr', 'SN', 'SR', 'mp', 'MP', 'Mp'])
-    for b in check_set_before:
-        for a in check_set_after:
-            sheet = sheet.replace(f'{b}/{a}', f'{b}{replace_text_slash}{a}')
-
-    # Zenkakify all Kana characters
-    sheet = mojimoji.han_to_zen(sheet, digit=False, ascii=False)
-
-    # Check lines
-    skills = []
-    for line in sheet.split('\n'):
-        skill = make_skill_from_text(line, sl_as_limit)
+        for line in pending:
+            skill = make_skill_from_line(line, sl_as_limit, cache)
+            if skill is not None:
+                yield skill
+        return
+    del pending
+
+    for line in lines:
+        if line.endswith('\n'):
+            line = line[:-1]
+        if skill_area_end_regex.fullmatch(line):
+            return
+        skill = make_skill_from_line(line, sl_as_limit, cache)
         if skill is not None:
-            skills.append(skill)
+            yield skill
 
-    # Repair escaped slash
-    for skill in skills:
-        if skill.usage_limitation is not None:
-            skill.usage_limitation = skill.usage_limitation.replace(
-                replace_text_slash, '/')
 
-    return skills
+def select_skill_area(lines: Sequence[str]) -> Sequence[str]:
+    """Return the lines of a charasheet which iter_skills parses.
 
+    Lines must not end with newlines.
+    """
+    end = None
+    for i, line in enumerate(lines):
+        if skill_area_begin_regex.fullmatch(line):
+            if end is not None:
+                return []
+            area = lines[i + 1:]
+            for j, area_line in enumerate(area):
+                if skill_area_end_regex.fullmatch(area_line):
+                    return area[:j]
+            return area
+        if end is None and skill_area_end_regex.fullmatch(line):
+            end = i
+    return lines[:end]
 
-def main(is_sleeve_mode: bool, large: bool, sl_as_limit: bool) -> None:
-    input_text = stdin.read()
-    skills = make_skills_from_charasheet(input_text, sl_as_limit)
-    print(generate_html(skills, is_sleeve_mode, large))
+
+def make_skills_from_charasheet(sheet: str, sl_as_limit: bool) -> List[Skill]:
+    return list(iter_skills(sheet.split('\n'), sl_as_limit))
+
+
+def main(
+    is_sleeve_mode: bool,
+    large: bool,
+    sl_as_limit: bool,
+    use_template: bool = False,
+    cache_path: Optional[Path] = None,
+    cache_size: int = default_max_entries,
+    fragment_cache_path: Optional[Path] = None,
+    output_dir: Optional[Path] = None,
+    pages_per_file: Optional[int] = None,
+    compact: bool = False,
+    compress: bool = False
+) -> None:
+    """Write html of the sheet from stdin into stdout.
+
+    If output_dir is given, pages are written into files of pages_per_file
+    pages there instead, with a stylesheet and an index page. If compact is
+    set, html is written without indentation. If compress is set, html
+    written into stdout is gzipped.
+    """
+    with ExitStack() as stack:
+        cache = None
+        if cache_path is not None:
+            cache = stack.enter_context(ParseCache(cache_path, cache_size))
+        fragment_cache = None
+        if fragment_cache_path is not None:
+            from .fragment_cache import FragmentCache
+            fragment_cache = stack.enter_context(
+                FragmentCache(fragment_cache_path))
+        skills = iter_skills(stdin, sl_as_limit, cache)
+        if output_dir is not None:
+            from .paginate import default_pages_per_file, write_paginated_html
+            render = None if fragment_cache is None \
+                else fragment_cache.render_page
+            write_paginated_html(skills, output_dir, is_sleeve_mode, large,
+                                 use_template,
+                                 pages_per_file or default_pages_per_file,
+                                 render=render, compact=compact)
+            return
+        stream = stdout
+        if compress:
+            stream = stack.enter_context(gzip_stream(stdout.buffer))
+        writer = write_html if fragment_cache is None \
+            else fragment_cache.write_html
+        writer(skills, stream, is_sleeve_mode, large, use_template, compact)
@@ -2,7 +2,10 @@ from __future__ import annotations
 
 import enum
 import re
-import mojimoji
+from typing import List, Optional, Tuple
+from .normalized_check import compile_table, normalize
+from .value_object import ValueObject
+from .zenhan import han_to_zen_token
 
 
 class RangeUnit(enum.Enum):
@@ -25,57 +28,67 @@ class SkillRangeKind(enum.Enum):
     string = enum.auto()
 
 
-class SkillRange:
-    kind_table = [
-        [SkillRangeKind.weapon, ('武器', '武', 'weapon', 'wp', 'w')],
-        [SkillRangeKind.sight, ('視界', '視', 'sight', 'st')],
-        [SkillRangeKind.scene, ('シーン', 'シ', 'scene', 'scn', 'sn')],
-        [SkillRangeKind.nothing, ('', '-')],
+class SkillRange(ValueObject):
+    __slots__ = ('_kind', '_value', '_unit', '_string')
+    _kind: SkillRangeKind
+    _value: Optional[int]
+    _unit: RangeUnit
+    _string: Optional[str]
+    kind_table: List[Tuple[SkillRangeKind, Tuple[str, ...]]] = [
+        (SkillRangeKind.weapon, ('武器', '武', 'weapon', 'wp', 'w')),
+        (SkillRangeKind.sight, ('視界', '視', 'sight', 'st')),
+        (SkillRangeKind.scene, ('シーン', 'シ', 'scene', 'scn', 'sn')),
+        (SkillRangeKind.nothing, ('', '-')),
     ]
+    kind_index = compile_table(kind_table)
     metre = re.compile(r'^\s*([0-9]+)\s*m?$', re.IGNORECASE)
     square = re.compile(r'^\s*([0-9]+)\s*sq$', re.IGNORECASE)
 
     def __init__(
         self,
         kind: SkillRangeKind,
-        value: int = None,
+        value: Optional[int] = None,
         unit: RangeUnit = RangeUnit.m,
-        string: str = None
+        string: Optional[str] = None
     ) -> None:
         if kind is SkillRangeKind.with_unit:
             assert value is not None
         elif kind is SkillRangeKind.string:
             assert string is not None
-        self._kind = kind
-        self._value = value
-        self._unit = unit
-        self._string = string
+        self._assign(_kind=kind, _value=value, _unit=unit, _string=string)
+
+    @property
+    def kind(self) -> SkillRangeKind:
+        return self._kind
+
+    def _args(self) -> Tuple[SkillRangeKind, Optional[int], RangeUnit, Optional[str]]:
+        return self._kind, self._value, self._unit, self._string
 
     @staticmethod
     def from_text(text: str) -> SkillRange:
-        for kind, candidates in SkillRange.kind_table:
-            for candidate in candidates:
-                if (mojimoji.zen_to_han(text).lower()
-                        == mojimoji.zen_to_han(candidate).lower()):
-                    return SkillRange(kind)
-        if mojimoji.zen_to_han(text).lower() in ('至近', '至'):
-            return SkillRange(SkillRangeKind.with_unit, 0)
+        normalized = normalize(text)
+        kind = SkillRange.kind_index.get(normalized)
+        if kind is not None:
+            return SkillRange.interned(kind)
+        if normalized in ('至近', '至'):
+            return SkillRange.interned(SkillRangeKind.with_unit, 0)
         if SkillRange.metre.match(text) is not None:
-            return SkillRange(
+            return SkillRange.interned(
                 SkillRangeKind.with_unit,
                 int(SkillRange.metre.match(text).group(1)),
                 RangeUnit.m
             )
         if SkillRange.square.match(text) is not None:
-            return SkillRange(
+            return SkillRange.interned(
                 SkillRangeKind.with_unit,
                 int(SkillRange.square.match(text).group(1)),
                 RangeUnit.sq
             )
 
-        return SkillRange(SkillRangeKind.string, string=text)
+        return SkillRange.interned(
+            SkillRangeKind.string, None, RangeUnit.m, text)
 
-    def __str__(self):
+    def _to_str(self) -> str:
         if self._kind is SkillRangeKind.nothing:
             return 'ー'
         elif self._kind is SkillRangeKind.weapon:
@@ -88,7 +101,7 @@ class SkillRange:
             assert self._value is not None
             if self._unit == RangeUnit.m and self._value == 0:
                 return '至近'
-            return mojimoji.han_to_zen(str(self._value) + str(self._unit))
+            return han_to_zen_token(str(self._value) + str(self._unit))
         else:
             assert self._kind is SkillRangeKind.string
             assert self._string is not None
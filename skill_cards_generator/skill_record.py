@@ -0,0 +1,105 @@
+import enum
+from typing import Any, Dict, List, Tuple
+from .skill import Skill
+from .ruby_string import RubyString
+from .judge import Judge, JudgeKind
+from .ability import Ability
+from .target import Target, TargetKind
+from .skill_range import SkillRange, SkillRangeKind, RangeUnit
+from .cost import Cost
+from .classifier import Classifier, ClassifierKind
+from .element import Element
+
+
+# A record is a list of the fields of a skill in the order of record_fields,
+# made of None, bool, int, str and lists only, so that it can be written as
+# JSON or packed without pickle.
+record_fields = (
+    'name', 'timing', 'judge', 'target', 'skill_range', 'cost',
+    'usage_limitation', 'effect', 'skill_class', 'level_above', 'level_now',
+    'critical', 'flavor',
+)
+
+# Types of the arguments of value objects, where a tuple means a sequence
+value_object_args: Dict[type, Tuple[Any, ...]] = {
+    Judge: (JudgeKind, Ability, str),
+    Target: (TargetKind, int, str),
+    SkillRange: (SkillRangeKind, int, RangeUnit, str),
+    Cost: (int, bool),
+    Classifier: (ClassifierKind, (Element,), str),
+}
+field_types: Dict[str, Any] = {
+    'name': RubyString,
+    'timing': str,
+    'judge': Judge,
+    'target': Target,
+    'skill_range': SkillRange,
+    'cost': Cost,
+    'usage_limitation': str,
+    'effect': str,
+    'skill_class': Classifier,
+    'level_above': int,
+    'level_now': int,
+    'critical': str,
+    'flavor': str,
+}
+
+
+class RecordError(ValueError):
+    pass
+
+
+def _encode(value_type: Any, value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value_type, tuple):
+        return [_encode(value_type[0], element) for element in value]
+    if value_type is RubyString:
+        return [[base, ruby] for base, ruby in value.get_segments()]
+    if value_type in value_object_args:
+        return [_encode(arg_type, arg) for arg_type, arg
+                in zip(value_object_args[value_type], value._args())]
+    if isinstance(value_type, type) and issubclass(value_type, enum.Enum):
+        return value.name
+    return value
+
+
+def _decode(value_type: Any, data: Any) -> Any:
+    if data is None:
+        return None
+    if isinstance(value_type, tuple):
+        return tuple(_decode(value_type[0], element) for element in data)
+    if value_type is RubyString:
+        segments = [(base, ruby) for base, ruby in data]
+        if not all(isinstance(base, str)
+                   and (ruby is None or isinstance(ruby, str))
+                   for base, ruby in segments):
+            raise TypeError('str expected')
+        return RubyString(segments)
+    if value_type in value_object_args:
+        return value_type.interned(*(
+            _decode(arg_type, arg) for arg_type, arg
+            in zip(value_object_args[value_type], data)))
+    if isinstance(value_type, type) and issubclass(value_type, enum.Enum):
+        return value_type[data]
+    if not isinstance(data, value_type):
+        raise TypeError(f'{value_type.__name__} expected')
+    return data
+
+
+def encode_record(skill: Skill) -> List[Any]:
+    """Encode a skill into a record."""
+    return [_encode(field_types[name], getattr(skill, name))
+            for name in record_fields]
+
+
+def decode_record(record: Any) -> Skill:
+    """Decode a record into its skill, raising RecordError if it is broken."""
+    if not isinstance(record, list) or len(record) != len(record_fields):
+        raise RecordError(
+            f'broken record: {len(record_fields)} fields expected')
+    try:
+        return Skill(**{name: _decode(field_types[name], data)
+                        for name, data in zip(record_fields, record)})
+    except (KeyError, TypeError, ValueError, AssertionError) as error:
+        raise RecordError(f'broken record: {error!r}') from error
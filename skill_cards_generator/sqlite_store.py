@@ -0,0 +1,121 @@
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# sqlite3 is imported only when a store is opened, since it takes long to
+# import compared with a run without cache.
+
+
+default_max_entries = 100000
+# Number of pending entries and usages written at once, bounding memory
+flush_interval = 1000
+
+
+class SqliteStore:
+    """On-disk LRU store of values keyed by text, in a table of sqlite.
+
+    Entries are evicted least recently used first when the table holds more
+    than max_entries, and all of them are dropped when version() differs
+    from the one the table was written with. New entries and usages are
+    written every flush_interval of them, so memory does not grow with the
+    input. The store can be shared by threads.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        table: str,
+        version: Callable[[], str],
+        max_entries: int = default_max_entries
+    ) -> None:
+        import sqlite3
+        self._table = table
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._used: Dict[str, float] = {}
+        self._added: Dict[str, Tuple[Any, float]] = {}
+        self._connection: Optional[sqlite3.Connection] = sqlite3.connect(
+            str(path), timeout=60, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self._connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} '
+                '(key TEXT PRIMARY KEY, value BLOB, used REAL)')
+            self._connection.execute(
+                f'CREATE INDEX IF NOT EXISTS {table}_used ON {table} (used)')
+            # Versions are kept for each table, so that stores can share a file
+            current_version = version()
+            row = self._connection.execute(
+                'SELECT value FROM meta WHERE key = ?', (table,)).fetchone()
+            if row is None or row[0] != current_version:
+                self._connection.execute(f'DELETE FROM {table}')
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                    (table, current_version))
+
+    def get(self, key: str) -> Any:
+        """Return the value of key, or None if it is not stored."""
+        with self._lock:
+            if key in self._added:
+                return self._added[key][0]
+            assert self._connection is not None
+            row = self._connection.execute(
+                f'SELECT value FROM {self._table} WHERE key = ?',
+                (key,)).fetchone()
+            if row is None:
+                return None
+            self._used[key] = time.time()
+        self._flush_if_full()
+        return row[0]
+
+    def touch(self, key: str) -> None:
+        """Record a use of key whose value is kept elsewhere, such as memory."""
+        with self._lock:
+            if key not in self._added:
+                self._used[key] = time.time()
+        self._flush_if_full()
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._added[key] = (value, time.time())
+        self._flush_if_full()
+
+    def _flush_if_full(self) -> None:
+        if len(self._added) >= flush_interval or len(self._used) >= flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write added entries and usage, then evict old entries."""
+        with self._lock:
+            if self._connection is None:
+                return
+            with self._connection:
+                self._connection.executemany(
+                    f'INSERT OR REPLACE INTO {self._table} VALUES (?, ?, ?)',
+                    [(key, value, used)
+                     for key, (value, used) in self._added.items()])
+                self._connection.executemany(
+                    f'UPDATE {self._table} SET used = ? WHERE key = ?',
+                    [(used, key) for key, used in self._used.items()])
+                self._connection.execute(
+                    f'DELETE FROM {self._table} WHERE key IN '
+                    f'(SELECT key FROM {self._table} '
+                    'ORDER BY used DESC LIMIT -1 OFFSET ?)',
+                    (self._max_entries,))
+            self._added.clear()
+            self._used.clear()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __enter__(self) -> 'SqliteStore':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import enum
-from typing import List, Tuple, Set
-import mojimoji
-from .normalized_check import normalize_and_check, normalize_and_compare
+from typing import List, Tuple, Set, Optional
+from .normalized_check import (
+    compile_table, normalize_and_check, normalize_and_compare)
+from .value_object import ValueObject
+from .zenhan import han_to_zen_token
 
 
 class TargetKind(enum.Enum):
@@ -50,25 +52,40 @@ unify_target_table: List[Tuple[TargetKind, Set[str]]] = [
                                    for cross in cross_set
                                    for selectable in selectable_set}),
 ]
+unify_target_index = compile_table(unify_target_table)
 kansuuji_table = str.maketrans('〇一二三四五六七八九零壱弐参', '01234567890123', '体')
 
 
-class Target:
+class Target(ValueObject):
+    __slots__ = ('_kind', '_num', '_string')
+    _kind: TargetKind
+    _num: Optional[int]
+    _string: Optional[str]
+
     def __init__(
         self,
         target_kind: TargetKind,
-        target_num: int = None,
-        string: str = None,
+        target_num: Optional[int] = None,
+        string: Optional[str] = None,
     ) -> None:
-        self._kind = target_kind
-        if self._kind is TargetKind.multiple:
+        if target_kind is TargetKind.multiple:
             assert target_num is not None and target_num >= 2
-            self._num = target_num
-        if self._kind is TargetKind.string:
+        else:
+            target_num = None
+        if target_kind is TargetKind.string:
             assert string is not None
-            self._string = string
+        else:
+            string = None
+        self._assign(_kind=target_kind, _num=target_num, _string=string)
+
+    @property
+    def kind(self) -> TargetKind:
+        return self._kind
+
+    def _args(self) -> Tuple[TargetKind, Optional[int], Optional[str]]:
+        return self._kind, self._num, self._string
 
-    def __str__(self):
+    def _to_str(self) -> str:
         if self._kind is TargetKind.myself:
             return '自身'
         elif self._kind is TargetKind.single:
@@ -76,7 +93,7 @@ class Target:
         elif self._kind is TargetKind.force_single:
             return '単体※'
         elif self._kind is TargetKind.multiple:
-            return mojimoji.han_to_zen(f'{self._num}体')
+            return han_to_zen_token(f'{self._num}体')
         elif self._kind is TargetKind.multiple_sl:
             return 'ＳＬ体'
         elif self._kind is TargetKind.engage:
@@ -97,14 +114,14 @@ class Target:
             return '十字（選択）'
         else:
             assert self._kind is TargetKind.string
-            return mojimoji.han_to_zen(self._string)
+            return han_to_zen_token(self._string)
 
     @staticmethod
     def from_text(text: str) -> Target:
         original = text
-        kind = normalize_and_check(text, unify_target_table)
+        kind = normalize_and_check(text, unify_target_index)
         if kind is not None:
-            return Target(kind)
+            return Target.interned(kind)
         assert len(text) > 0
         text = text.translate(kansuuji_table)
         try:
@@ -112,7 +129,7 @@ class Target:
         except ValueError:
             num = None
         if num:
-            return Target(TargetKind.multiple, num)
+            return Target.interned(TargetKind.multiple, num)
         if normalize_and_compare(text, 'sl'):
-            return Target(TargetKind.multiple_sl)
-        return Target(TargetKind.string, string=original)
+            return Target.interned(TargetKind.multiple_sl)
+        return Target.interned(TargetKind.string, None, original)
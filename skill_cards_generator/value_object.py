@@ -0,0 +1,87 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Tuple, Type, TypeVar
+
+
+V = TypeVar('V', bound='ValueObject')
+
+# At most this number of canonical instances are kept
+max_interned = 4096
+_canonical: Dict[Tuple[type, Tuple[Any, ...]], 'ValueObject'] = {}
+_by_args: Dict[Tuple[type, Tuple[Any, ...]], 'ValueObject'] = {}
+
+
+class ValueObject(ABC):
+    """Immutable object compared by value, which can be interned.
+
+    Subclasses set their slots in __init__ with _assign, give the arguments
+    to rebuild themselves by _args, and their text by _to_str. A subclass
+    missing either of them is refused when it is defined.
+    """
+
+    __slots__ = ('_str_cache',)
+    # Slots are declared for type checkers, and set only through _assign
+    _str_cache: str
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        missing = [name for name in ('_args', '_to_str')
+                   if getattr(getattr(cls, name), '__isabstractmethod__', False)]
+        if missing:
+            raise TypeError(f'{cls.__name__} does not implement {", ".join(missing)}')
+
+    def _assign(self, **attributes: Any) -> None:
+        for name, value in attributes.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    @abstractmethod
+    def _args(self) -> Tuple[Any, ...]:
+        """Return the arguments which rebuild the object."""
+
+    @abstractmethod
+    def _to_str(self) -> str:
+        """Return the text of the object."""
+
+    def __str__(self) -> str:
+        try:
+            return self._str_cache
+        except AttributeError:
+            text = self._to_str()
+            object.__setattr__(self, '_str_cache', text)
+            return text
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and self._args() == other._args()
+
+    def __hash__(self) -> int:
+        return hash((type(self), self._args()))
+
+    def __repr__(self) -> str:
+        args = ', '.join(repr(arg) for arg in self._args())
+        return f'{type(self).__name__}({args})'
+
+    def __reduce__(self) -> Any:
+        return type(self).interned, self._args()
+
+    @classmethod
+    def interned(cls: Type[V], *args: Any) -> V:
+        """Return the canonical instance equal to cls(*args)."""
+        key = (cls, args)
+        instance = _by_args.get(key)
+        if instance is not None:
+            return instance  # type: ignore
+        new_instance = cls(*args)
+        canonical_key = (cls, new_instance._args())
+        instance = _canonical.get(canonical_key)
+        if instance is None:
+            if len(_canonical) >= max_interned:
+                return new_instance
+            instance = _canonical[canonical_key] = new_instance
+        if len(_by_args) < max_interned:
+            _by_args[key] = instance
+        return instance  # type: ignore
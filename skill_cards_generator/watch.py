@@ -0,0 +1,129 @@
+import os
+import time
+from pathlib import Path
+from sys import stderr
+from typing import Dict, List, Optional, TextIO, Tuple
+from .skill import Skill
+from .html_generator import open_html, split_pages, write_pages
+from .fragment_cache import FragmentCache
+from .parse_cache import MemorySkillCache
+from .skill_crawler import iter_skills
+
+
+class IncrementalRenderer:
+    """Render a sheet file again and again, reusing unchanged results.
+
+    Lines are parsed only when their text changed, and pages are rendered
+    only when any of their skills changed, reusing the cards of unchanged
+    skills. The file is gzipped if compress is set. Cards are also cached in
+    fragment_cache_path if it is given, so that a restart renders fast.
+    """
+
+    def __init__(
+        self,
+        is_sleeve_mode: bool,
+        large: bool,
+        sl_as_limit: bool,
+        use_template: bool = False,
+        compact: bool = False,
+        compress: bool = False,
+        fragment_cache_path: Optional[Path] = None
+    ) -> None:
+        self._is_sleeve_mode = is_sleeve_mode
+        self._large = large
+        self._sl_as_limit = sl_as_limit
+        self._use_template = use_template
+        self._compact = compact
+        self._compress = compress
+        self._skill_cache = MemorySkillCache()
+        self._fragment_cache = FragmentCache(fragment_cache_path)
+        self._pages: Dict[Tuple[int, ...], Tuple[List[Skill], str]] = {}
+
+    def render(self, input_path: Path, output_path: Path) -> Tuple[int, int, int]:
+        """Render the sheet into output_path.
+
+        Return the numbers of skills, pages and newly rendered pages.
+        """
+        with input_path.open('r', encoding='utf-8') as input_file:
+            skills = list(iter_skills(
+                input_file, self._sl_as_limit, self._skill_cache))
+        self._skill_cache.next_generation()
+
+        # Cached skills are the same objects, so a page is identified by ids.
+        # Skills are kept with pages so that their ids are not reused.
+        pages: Dict[Tuple[int, ...], Tuple[List[Skill], str]] = {}
+        page_list: List[str] = []
+        num_rendered = 0
+        for page_skills in split_pages(skills):
+            key = tuple(id(skill) for skill in page_skills)
+            if key in self._pages:
+                page = self._pages[key][1]
+            else:
+                page = self._fragment_cache.render_page(
+                    page_skills, self._is_sleeve_mode, self._large,
+                    self._use_template, self._compact)
+                num_rendered += 1
+            pages[key] = (page_skills, page)
+            page_list.append(page)
+        self._pages = pages
+
+        temporary_path = output_path.with_name(output_path.name + '.tmp')
+        with open_html(temporary_path, self._compress) as output_file:
+            write_pages(page_list, output_file, self._is_sleeve_mode,
+                        self._use_template, compact=self._compact)
+        os.replace(str(temporary_path), str(output_path))
+        self._fragment_cache.flush()
+        return len(skills), len(page_list), num_rendered
+
+    def close(self) -> None:
+        self._fragment_cache.close()
+
+
+def _stat(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def watch(
+    input_path: Path,
+    output_path: Path,
+    is_sleeve_mode: bool,
+    large: bool,
+    sl_as_limit: bool,
+    use_template: bool = False,
+    interval: float = 0.5,
+    report: TextIO = stderr,
+    compact: bool = False,
+    compress: bool = False,
+    fragment_cache_path: Optional[Path] = None
+) -> None:
+    """Render the sheet into output_path whenever it is changed."""
+    renderer = IncrementalRenderer(
+        is_sleeve_mode, large, sl_as_limit, use_template, compact, compress,
+        fragment_cache_path)
+    last_stat = None
+    print(f'watching {input_path}', file=report)
+    try:
+        while True:
+            stat = _stat(input_path)
+            if stat is not None and stat != last_stat:
+                last_stat = stat
+                begin = time.perf_counter()
+                try:
+                    num_skills, num_pages, num_rendered = renderer.render(
+                        input_path, output_path)
+                except Exception as e:
+                    print(f'failed: {type(e).__name__}: {e}', file=report)
+                else:
+                    elapsed = time.perf_counter() - begin
+                    print(f'updated {output_path}: {num_skills} skills, '
+                          f'{num_rendered}/{num_pages} pages rendered '
+                          f'in {elapsed:.3f}s', file=report)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        renderer.close()
@@ -0,0 +1,26 @@
+from functools import lru_cache, partial
+import mojimoji
+
+
+# Number of memoized results of short tokens
+memo_size = 4096
+
+# Width conversions with the options used over the package. mojimoji
+# converts a whole string in one pass in C, which is faster than
+# str.translate with a table of non-ASCII characters, so long texts such as
+# effects are converted directly.
+han_to_zen = mojimoji.han_to_zen
+kana_to_zen = partial(mojimoji.han_to_zen, digit=False, ascii=False)
+zen_to_han = mojimoji.zen_to_han
+
+
+@lru_cache(maxsize=memo_size)
+def han_to_zen_token(text: str) -> str:
+    """han_to_zen memoized for short tokens such as ranges and limitations."""
+    return han_to_zen(text)
+
+
+@lru_cache(maxsize=memo_size)
+def zen_number(value: int) -> str:
+    """Zenkaku digits of a number such as a level or a cost."""
+    return han_to_zen(str(value))
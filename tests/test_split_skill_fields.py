@@ -0,0 +1,53 @@
+import random
+import unittest
+from skill_cards_generator.skill_crawler import skill_regex, split_skill_fields
+
+
+# Pieces of skill lines, with the whitespace skill_regex treats specially
+pieces = ['《', '》', '/', ' ', '  ', '\t', '\t\t', '\n', '　', '\x0b', ' ',
+          'a', 'ab', 'スキル', 'SL', '1', '-', '《名》', '|', '（', '）']
+
+
+def expected(line):
+    match = skill_regex.fullmatch(line)
+    return None if match is None else match.groups()
+
+
+def random_line(rng):
+    line = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 30)))
+    if rng.random() < 0.7:
+        line = '《' + line
+    return line
+
+
+def random_skill_line(rng):
+    """A line close to a skill line, with random spaces around its fields."""
+    def space():
+        return ''.join(rng.choice([' ', '\t', '　', ''])
+                       for _ in range(rng.randint(0, 4)))
+    fields = [rng.choice(['', 'a', 'メジャー', '自動成功', 'a b', '-'])
+              for _ in range(7)]
+    return ('《' + rng.choice(['名前', '名|前', 'a》b', '']) + '》' + space()
+            + rng.choice(['1', 'SL', '', '《', '1 2'])
+            + ''.join(space() + '/' + space() + field for field in fields)
+            + space() + rng.choice(['効果。', '', '効果\n続き', '\t効果\t']))
+
+
+class SplitSkillFieldsTest(unittest.TestCase):
+    def test_same_as_skill_regex_on_random_lines(self):
+        rng = random.Random(0)
+        for _ in range(50000):
+            line = random_line(rng)
+            self.assertEqual(split_skill_fields(line), expected(line),
+                             repr(line))
+
+    def test_same_as_skill_regex_on_spaced_skill_lines(self):
+        rng = random.Random(1)
+        for _ in range(50000):
+            line = random_skill_line(rng)
+            self.assertEqual(split_skill_fields(line), expected(line),
+                             repr(line))
+
+
+if __name__ == '__main__':
+    unittest.main()